@@ -0,0 +1,73 @@
+"""
+activity_gate.py
+
+Cheap per-camera "did anything change?" checks used by detector_pipeline to
+skip work on idle feeds (an empty lobby at night looks the same frame after
+frame).
+
+FrameChange shrinks each frame to a small grayscale thumbnail and diffs it
+against the previous one, once per tick; every gating decision (the YOLO
+gate below and MotionDetector's MOG2 skip) uses that one result. ActivityGate
+then counts a camera as active when its frame changed, when it produced a
+YOLO event recently, or when it hasn't had a full detector pass for
+ACTIVITY_MAX_SKIP_SECS (heartbeat, so a person who walked in and stood still
+is still reported).
+"""
+import time
+
+import cv2
+import numpy as np
+
+from config import (
+    ACTIVITY_DIFF_THRESHOLD,
+    ACTIVITY_HOLD_SECS,
+    ACTIVITY_MAX_SKIP_SECS,
+    ACTIVITY_MIN_CHANGED_PX,
+)
+
+_THUMB_SIZE = (160, 120)  # (w, h)
+
+
+class FrameChange:
+    """Per-camera thumbnail diff against the previous tick's frame. Not
+    thread-safe per camera — the pipeline never has two frames from the same
+    camera in flight."""
+
+    def __init__(self) -> None:
+        self._prev_thumb: dict[str, np.ndarray] = {}
+
+    def changed(self, frame: np.ndarray, cam_id: str) -> bool:
+        """True if enough thumbnail pixels moved since the last call (always for the first)."""
+        small = cv2.resize(frame, _THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        thumb = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        prev = self._prev_thumb.get(cam_id)
+        self._prev_thumb[cam_id] = thumb
+        if prev is None:
+            return True
+        diff = cv2.absdiff(thumb, prev)
+        _, mask = cv2.threshold(diff, ACTIVITY_DIFF_THRESHOLD, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(mask) >= ACTIVITY_MIN_CHANGED_PX
+
+
+class ActivityGate:
+    """Per-camera YOLO gate on top of FrameChange: hold after events plus a heartbeat."""
+
+    def __init__(self) -> None:
+        self._last_full_pass: dict[str, float] = {}
+        self._last_event: dict[str, float] = {}
+
+    def is_active(self, cam_id: str, changed: bool) -> bool:
+        """Whether cam_id's frame this tick goes to the YOLO detectors."""
+        now = time.monotonic()
+        active = (
+            changed
+            or now - self._last_event.get(cam_id, float("-inf")) < ACTIVITY_HOLD_SECS
+            or now - self._last_full_pass.get(cam_id, float("-inf")) >= ACTIVITY_MAX_SKIP_SECS
+        )
+        if active:
+            self._last_full_pass[cam_id] = now
+        return active
+
+    def record_events(self, cam_id: str) -> None:
+        """Keep a camera active for ACTIVITY_HOLD_SECS after a YOLO detection."""
+        self._last_event[cam_id] = time.monotonic()
@@ -0,0 +1,160 @@
+"""
+calibrate_int8.py — Build INT8 TensorRT engines for the YOLO detectors.
+
+Samples calibration frames evenly from videos/*.mp4, writes them out as a
+tiny YOLO dataset, and exports each detector's weights with int8=True.
+Ultralytics calibrates with TensorRT's MinMax calibrator, which holds up
+better on detection heads than entropy calibration.
+
+Engines land in models/<stem>_int8.engine; detectors pick them up at startup
+when DETECTION_DEVICE is cuda (see detectors/yolo_loader.py) and fall back to
+the .pt weights otherwise. Engines are tied to the GPU and TensorRT version
+they were built with — rebuild after changing either.
+
+With --images-dir, calibration frames are sampled from an existing image
+folder instead (e.g. the weapon training set's CCTV frames, where guns are
+far more common than in the demo videos).
+
+Usage:
+    python calibrate_int8.py
+    python calibrate_int8.py --frames 300 --models person weapon
+    python calibrate_int8.py --models weapon --images-dir Images
+"""
+import argparse
+import shutil
+from pathlib import Path
+
+import cv2
+
+from benchmark import sample_frames
+from config import BASE_DIR, CAMERAS, MODEL_DIR, VIDEOS_DIR
+from detectors.yolo_loader import int8_engine_path
+
+CALIB_DIR = BASE_DIR / "calibration"
+
+TARGETS = {
+    "person": MODEL_DIR / "yolo11s.pt",
+    "pose":   BASE_DIR / "yolov8n-pose.pt",
+    "weapon": MODEL_DIR / "weapon.pt",
+}
+
+
+def write_calibration_set(n_frames: int) -> Path:
+    """Dump ~n_frames JPEGs sampled across all videos; return the image dir."""
+    videos = sorted(VIDEOS_DIR.glob("*.mp4"))
+    if not videos:
+        raise SystemExit(f"No videos found in {VIDEOS_DIR}")
+
+    img_dir = CALIB_DIR / "images"
+    shutil.rmtree(img_dir, ignore_errors=True)
+    img_dir.mkdir(parents=True)
+
+    per_video = max(1, n_frames // len(videos))
+    total = 0
+    for video in videos:
+        for i, frame in enumerate(sample_frames(str(video), per_video)):
+            cv2.imwrite(str(img_dir / f"{video.stem}_{i:04d}.jpg"), frame)
+            total += 1
+    print(f"  {total} calibration frames from {len(videos)} videos → {img_dir}")
+    return img_dir
+
+
+def copy_calibration_images(src_dir: Path, n_frames: int) -> Path:
+    """Copy ~n_frames images sampled evenly from src_dir; return the image dir."""
+    images = sorted(
+        p for p in src_dir.rglob("*") if p.suffix.lower() in {".jpg", ".jpeg", ".png"}
+    )
+    if not images:
+        raise SystemExit(f"No images found in {src_dir}")
+
+    img_dir = CALIB_DIR / "images"
+    shutil.rmtree(img_dir, ignore_errors=True)
+    img_dir.mkdir(parents=True)
+
+    step = max(1, len(images) // n_frames)
+    picked = images[::step][:n_frames]
+    for i, image in enumerate(picked):
+        shutil.copy(image, img_dir / f"{i:04d}{image.suffix.lower()}")
+    print(f"  {len(picked)} calibration frames from {src_dir} → {img_dir}")
+    return img_dir
+
+
+def write_calibration_yaml(img_dir: Path, names: dict[int, str], tag: str, task: str) -> Path:
+    """Ultralytics reads calibration images from the dataset's val split.
+
+    Pose datasets must also declare the keypoint layout (COCO: 17 x, y, visible).
+    """
+    yaml_path = CALIB_DIR / f"calib_{tag}.yaml"
+    kpt_shape = "kpt_shape: [17, 3]\n" if task == "pose" else ""
+    yaml_path.write_text(
+        f"path: {CALIB_DIR.resolve()}\n"
+        f"train: {img_dir.name}\n"
+        f"val:   {img_dir.name}\n"
+        f"names: {dict(names)}\n"
+        f"{kpt_shape}"
+    )
+    return yaml_path
+
+
+def export_int8(tag: str, weights: Path, img_dir: Path) -> None:
+    from ultralytics import YOLO
+
+    if not weights.exists():
+        print(f"  [{tag}] {weights} not found — skipping")
+        return
+
+    model = YOLO(str(weights))
+    data = write_calibration_yaml(img_dir, model.names, tag, model.task)
+    print(f"  [{tag}] Exporting {weights.name} to INT8 engine...", flush=True)
+    exported = model.export(
+        format="engine",
+        int8=True,
+        data=str(data),
+        dynamic=True,
+        batch=len(CAMERAS),   # the pipeline batches one frame per camera
+        imgsz=640,
+        device=0,
+        workspace=4,
+    )
+    dst = int8_engine_path(weights)
+    shutil.move(str(exported), str(dst))
+    print(f"  [{tag}] → {dst}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build INT8 TensorRT engines for the detectors")
+    parser.add_argument(
+        "--frames", type=int, default=500,
+        help="Approximate number of calibration frames across all videos (default: 500)"
+    )
+    parser.add_argument(
+        "--models", nargs="+", choices=sorted(TARGETS), default=sorted(TARGETS),
+        help="Which detector weights to export (default: all)"
+    )
+    parser.add_argument(
+        "--images-dir", type=Path, default=None,
+        help="Sample calibration frames from this image folder instead of videos/"
+    )
+    args = parser.parse_args()
+
+    print("\nSampling calibration frames...")
+    if args.images_dir is not None:
+        img_dir = copy_calibration_images(args.images_dir, args.frames)
+    else:
+        img_dir = write_calibration_set(args.frames)
+
+    print("\nExporting engines...")
+    failed = []
+    for tag in args.models:
+        # One target failing (bad weights, TensorRT error) shouldn't stop the rest
+        try:
+            export_int8(tag, TARGETS[tag], img_dir)
+        except Exception as exc:
+            print(f"  [{tag}] Export failed: {exc}")
+            failed.append(tag)
+    if failed:
+        raise SystemExit(f"\nFailed: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,104 +1,326 @@
+import logging
+import sys
 import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 import cv2
 import numpy as np
+from pydantic import TypeAdapter
 
-from config import CAMERAS, JPEG_QUALITY, MJPEG_FPS_TARGET, VIDEOS_DIR
+from config import CAMERAS, DETECTION_DEVICE, JPEG_QUALITY, MJPEG_FPS_TARGET, VIDEOS_DIR
 from models import CameraStatus
 
+logger = logging.getLogger(__name__)
+
+
+def _load_turbojpeg():
+    """Return PyTurboJPEG's (TurboJPEG, TJPF_BGR) if it should replace cv2, else None.
+
+    OpenCV wheels usually bundle libjpeg-turbo already; if this build doesn't,
+    use PyTurboJPEG (pip install PyTurboJPEG) when the native lib is present.
+    """
+    if "libjpeg-turbo" in cv2.getBuildInformation():
+        return None
+    try:
+        from turbojpeg import TJPF_BGR, TurboJPEG
+        TurboJPEG()  # raises OSError if libturbojpeg itself is missing
+    except (ImportError, OSError):
+        logger.info("[camera] OpenCV lacks libjpeg-turbo and PyTurboJPEG unavailable — using cv2")
+        return None
+    logger.info("[camera] JPEG encoding via PyTurboJPEG")
+    return TurboJPEG, TJPF_BGR
+
+
+def _load_nvjpeg() -> Optional[Callable[[np.ndarray], Optional[bytes]]]:
+    """Return a GPU (nvJPEG) BGR → JPEG encoder on CUDA hosts, else None.
+
+    Uses torchvision's CUDA encode_jpeg (torchvision >= 0.19, installed with
+    ultralytics). Encoding is serialized behind one lock, since torchvision's
+    CUDA encoder isn't documented as thread-safe; a frame takes well under a
+    millisecond on the GPU, so viewers of different cameras barely contend.
+    """
+    if not DETECTION_DEVICE.startswith("cuda"):
+        return None
+    try:
+        import torch
+        from torchvision.io import encode_jpeg
+        encode_jpeg(torch.zeros((3, 16, 16), dtype=torch.uint8, device=DETECTION_DEVICE))
+    except Exception as exc:  # old torchvision, no CUDA build, no GPU
+        logger.info("[camera] nvJPEG unavailable (%s) — using CPU JPEG encoding", exc)
+        return None
+
+    lock = threading.Lock()
+
+    def encode(frame: np.ndarray) -> Optional[bytes]:
+        # HWC BGR → CHW RGB on the GPU, so only the frame itself is uploaded
+        image = torch.from_numpy(frame).to(DETECTION_DEVICE).permute(2, 0, 1).flip(0)
+        with lock:
+            jpeg = encode_jpeg(image.contiguous(), quality=JPEG_QUALITY)
+        return jpeg.cpu().numpy().tobytes()
+
+    logger.info("[camera] JPEG encoding via nvJPEG on %s", DETECTION_DEVICE)
+    return encode
+
+
+_nvjpeg_encode = _load_nvjpeg()
+_turbojpeg = None if _nvjpeg_encode is not None else _load_turbojpeg()
+_IMENCODE_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY, cv2.IMWRITE_JPEG_OPTIMIZE, 0]
+
+
+def _cv2_encode(frame: np.ndarray) -> Optional[bytes]:
+    ok, buf = cv2.imencode(".jpg", frame, _IMENCODE_PARAMS)
+    return bytes(buf) if ok else None
+
+
+def _capture_backends() -> list[tuple[int, list[int]]]:
+    """(apiPreference, params) pairs to try when opening a video, best first.
+
+    Hardware decode (NVDEC / VAAPI / VideoToolbox via FFmpeg) is requested
+    before the plain software path; OpenCV hands back CPU BGR frames either way.
+    """
+    backends: list[tuple[int, list[int]]] = []
+    if sys.platform == "darwin":
+        backends.append((cv2.CAP_AVFOUNDATION, []))
+    if hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+        # CAP_PROP_HW_DEVICE is rejected alongside VIDEO_ACCELERATION_ANY
+        backends.append((cv2.CAP_FFMPEG, [
+            cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+        ]))
+    backends.append((cv2.CAP_ANY, []))
+    return backends
+
+
+_CAPTURE_BACKENDS = _capture_backends()
+
+
+def _make_jpeg_encoder() -> Callable[[np.ndarray], Optional[bytes]]:
+    """Return a BGR → JPEG encoder for one camera.
+
+    Every camera streams a fixed resolution at JPEG_QUALITY, so a dedicated
+    TurboJPEG handle keeps its quant/Huffman setup and scratch buffers warm
+    between frames. Handles aren't thread-safe, hence one per camera. On CUDA
+    hosts all cameras share the nvJPEG encoder instead.
+    """
+    if _nvjpeg_encode is not None:
+        return _nvjpeg_encode
+    if _turbojpeg is None:
+        return _cv2_encode
+    turbo_cls, pixel_format = _turbojpeg
+    turbo = turbo_cls()
+    return lambda frame: turbo.encode(frame, quality=JPEG_QUALITY, pixel_format=pixel_format)
+
 
 class CameraCapture:
     def __init__(self, video_path: Path):
         self._path = video_path
         self._cap: Optional[cv2.VideoCapture] = None
-        self._lock = threading.Lock()
-        self._online = False
-        self._latest_frame: Optional[np.ndarray] = None
+        self._is_online = False
+        # (seq, frame) of the latest decoded frame; written only by the broker
+        # thread, read without a lock (deque append/[-1] are atomic)
+        self._frames: deque[tuple[int, np.ndarray]] = deque(maxlen=1)
+        self._frame_seq = 0
         self._latest_jpeg: Optional[bytes] = None
+        self._jpeg_seq = -1
+        self._encode = _make_jpeg_encoder()
+        self._encode_lock = threading.Lock()
         self._stop = threading.Event()
-        self._thread: Optional[threading.Thread] = None
+        self._target_interval = 1.0 / MJPEG_FPS_TARGET
+        self._next_due = 0.0
+        # Second handle on the same file, opened in the background and swapped
+        # in at EOF so looping never waits on a seek back to frame 0
+        self._spare: Optional[cv2.VideoCapture] = None
         self._open()
         if self._online:
-            self._start_decode_thread()
+            native_fps = self._cap.get(cv2.CAP_PROP_FPS)
+            if native_fps > 0:
+                self._target_interval = 1.0 / native_fps
+            self._prepare_spare()
+            _broker.add(self)
+
+    def _new_capture(self) -> Optional[cv2.VideoCapture]:
+        for api, params in _CAPTURE_BACKENDS:
+            try:
+                cap = cv2.VideoCapture(str(self._path), api, params)
+            except cv2.error:
+                continue
+            if cap.isOpened():
+                return cap
+            cap.release()
+        return None
 
     def _open(self) -> None:
         if not self._path.exists():
             self._online = False
             return
-        cap = cv2.VideoCapture(str(self._path))
-        if cap.isOpened():
-            self._cap = cap
-            self._online = True
-        else:
-            self._online = False
+        self._cap = self._new_capture()
+        self._online = self._cap is not None
 
-    def _start_decode_thread(self) -> None:
-        fps = MJPEG_FPS_TARGET
-        if self._cap is not None:
-            native_fps = self._cap.get(cv2.CAP_PROP_FPS)
-            if native_fps > 0:
-                fps = native_fps
-        self._target_interval = 1.0 / fps
-        self._thread = threading.Thread(target=self._decode_loop, daemon=True)
-        self._thread.start()
+    def _prepare_spare(self) -> None:
+        def _open_spare() -> None:
+            cap = self._new_capture()
+            if cap is not None and self._stop.is_set():
+                cap.release()
+                return
+            self._spare = cap
 
-    def _decode_loop(self) -> None:
-        while not self._stop.is_set():
-            start = time.monotonic()
-            with self._lock:
-                if not self._online or self._cap is None:
-                    break
-                ret, frame = self._cap.read()
-                if not ret:
-                    self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                    ret, frame = self._cap.read()
-                    if not ret:
-                        break
-                self._latest_frame = frame
-                ok, buf = cv2.imencode(
-                    ".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
-                )
-                if ok:
-                    self._latest_jpeg = bytes(buf)
-            elapsed = time.monotonic() - start
-            sleep_time = self._target_interval - elapsed
-            if sleep_time > 0:
-                self._stop.wait(sleep_time)
+        threading.Thread(target=_open_spare, daemon=True).start()
+
+    def _rewind(self, cap: cv2.VideoCapture) -> cv2.VideoCapture:
+        """Loop back to the start, preferring the pre-opened spare over a seek."""
+        spare, self._spare = self._spare, None
+        if spare is None:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            return cap
+        self._cap = spare
+        cap.release()
+        self._prepare_spare()
+        return spare
+
+    def _grab(self) -> bool:
+        """Advance to the next frame without decoding it, looping at EOF."""
+        cap = self._cap
+        if cap.grab():
+            return True
+        return self._rewind(cap).grab()
+
+    def _retrieve(self, now: float) -> None:
+        """Decode the grabbed frame and publish it. Called by the broker thread."""
+        self._next_due = max(self._next_due, now) + self._target_interval
+        ret, frame = self._cap.retrieve()
+        if ret:
+            self._frame_seq += 1
+            self._frames.append((self._frame_seq, frame))
+
+    @property
+    def _online(self) -> bool:
+        return self._is_online
+
+    @_online.setter
+    def _online(self, value: bool) -> None:
+        global _status_version
+        if value != self._is_online:
+            self._is_online = value
+            _status_version += 1  # get_all_statuses() rebuilds on next call
 
     @property
     def online(self) -> bool:
-        return self._online
+        return self._is_online
 
     def read_frame(self) -> Optional[bytes]:
-        """Return the latest cached JPEG snapshot."""
-        with self._lock:
-            return self._latest_jpeg
+        """Return the latest frame as JPEG, encoding it on first request.
+
+        Cameras nobody is watching never pay for JPEG encoding. The result is
+        cached until the next decoded frame; concurrent viewers of one camera
+        wait on the encode lock and then reuse the cached result instead of
+        encoding again.
+        """
+        with self._encode_lock:
+            try:
+                seq, frame = self._frames[-1]
+            except IndexError:
+                return None
+            if seq == self._jpeg_seq:
+                return self._latest_jpeg
+            jpeg = self._encode(frame)
+            if jpeg is None:
+                return None
+            self._latest_jpeg, self._jpeg_seq = jpeg, seq
+            return jpeg
 
     def get_latest_frame(self) -> Optional[np.ndarray]:
         """Return a copy of the most recently decoded frame as a numpy array."""
-        with self._lock:
-            if self._latest_frame is None:
-                return None
-            return self._latest_frame.copy()
+        try:
+            return self._frames[-1][1].copy()
+        except IndexError:
+            return None
 
     def release(self) -> None:
+        self._stop.set()
+        _broker.remove(self)  # waits out any in-progress grab/retrieve
+        if self._cap:
+            self._cap.release()
+            self._cap = None
+        if self._spare:
+            self._spare.release()
+            self._spare = None
+        self._online = False
+        self._frames.clear()
+        with self._encode_lock:
+            self._latest_jpeg = None
+            self._jpeg_seq = -1
+
+
+class _FrameBroker:
+    """Single thread that decodes every camera, each at its own native FPS.
+
+    Each pass grab()s all due captures first (demux only, cheap) and then
+    retrieve()s them, instead of running one sleeping thread per camera.
+    """
+
+    def __init__(self) -> None:
+        self._captures: list[CameraCapture] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, capture: CameraCapture) -> None:
+        with self._lock:
+            self._captures.append(capture)
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="frame-broker", daemon=True
+                )
+                self._thread.start()
+
+    def remove(self, capture: CameraCapture) -> None:
+        with self._lock:
+            if capture in self._captures:
+                self._captures.remove(capture)
+
+    def stop(self) -> None:
         self._stop.set()
         if self._thread is not None:
             self._thread.join(timeout=2)
-        with self._lock:
-            if self._cap:
-                self._cap.release()
-                self._cap = None
-            self._online = False
-            self._latest_frame = None
-            self._latest_jpeg = None
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with self._lock:
+                now = time.monotonic()
+                due = [c for c in self._captures if c._next_due <= now]
+                grabbed = []
+                for capture in due:
+                    if capture._grab():
+                        grabbed.append(capture)
+                    else:
+                        logger.warning("Camera %s stopped producing frames", capture._path.stem)
+                        capture._online = False
+                        self._captures.remove(capture)
+                for capture in grabbed:
+                    capture._retrieve(now)
+                wake = min((c._next_due for c in self._captures), default=now + 0.1)
+            delay = wake - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
 
 
+_broker = _FrameBroker()
+# read_frame() calls from the async endpoints (JPEG encode) run here, so they never
+# queue behind unrelated work on the event loop's default executor
+CAMERA_EXECUTOR = ThreadPoolExecutor(max_workers=len(CAMERAS), thread_name_prefix="cam")
 _captures: dict[str, CameraCapture] = {}
 
+# Bumped whenever any capture goes online/offline; polling /cameras reuses
+# the cached status list until it changes.
+_status_version = 0
+_status_cache: tuple[int, list[CameraStatus], bytes] = (-1, [], b"[]")
+_STATUS_LIST = TypeAdapter(list[CameraStatus])
+
 
 def init_cameras() -> None:
     for cam in CAMERAS:
@@ -110,8 +332,12 @@ def get_capture(cam_id: str) -> Optional[CameraCapture]:
     return _captures.get(cam_id)
 
 
-def get_all_statuses() -> list[CameraStatus]:
-    return [
+def _refresh_statuses() -> tuple[int, list[CameraStatus], bytes]:
+    global _status_cache
+    if _status_cache[0] == _status_version:
+        return _status_cache
+    version = _status_version
+    statuses = [
         CameraStatus(
             id=cam["id"],
             name=cam["name"],
@@ -121,8 +347,21 @@ def get_all_statuses() -> list[CameraStatus]:
         )
         for cam in CAMERAS
     ]
+    _status_cache = (version, statuses, _STATUS_LIST.dump_json(statuses))
+    return _status_cache
+
+
+def get_all_statuses() -> list[CameraStatus]:
+    return _refresh_statuses()[1]
+
+
+def get_all_statuses_json() -> bytes:
+    """get_all_statuses() as JSON, serialized once per status change."""
+    return _refresh_statuses()[2]
 
 
 def shutdown_cameras() -> None:
     for cap in _captures.values():
         cap.release()
+    _broker.stop()
+    CAMERA_EXECUTOR.shutdown(wait=False, cancel_futures=True)
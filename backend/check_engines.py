@@ -0,0 +1,118 @@
+"""
+check_engines.py — Check that the TensorRT engines agree with their .pt weights.
+
+Runs one frame through each detector's weights twice, once as PyTorch and
+once as every cached engine (INT8 from calibrate_int8.py, FP16 from
+load_yolo()), using the same prepare_inputs() path the detectors use. The
+boxes must pair up one to one with matching classes and high IoU. A layout
+or preprocessing mismatch between the two shows up here as missing or
+scattered boxes rather than silently wrong detections.
+
+Needs DETECTION_DEVICE=cuda. Exits non-zero if any engine disagrees.
+
+Usage:
+    python check_engines.py
+    python check_engines.py --image snapshot.jpg --models weapon
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from benchmark import sample_frames
+from calibrate_int8 import TARGETS
+from config import DETECTION_DEVICE, VIDEOS_DIR
+from detectors.tracking import iou_matrix
+from detectors.yolo_loader import (
+    fp16_engine_path,
+    int8_engine_path,
+    make_predictor,
+    prepare_inputs,
+    takes_channels_last,
+    to_host,
+)
+
+MIN_IOU = 0.9  # INT8 shifts boxes by a few pixels at most; a wrong layout scatters them
+
+
+def run_boxes(model, frame: np.ndarray, conf: float) -> np.ndarray:
+    """(n, 6) x1 y1 x2 y2 conf cls for `frame`, through the detectors' input path."""
+    predictor = make_predictor(model, conf=conf)
+    inputs, regions = prepare_inputs([frame], channels_last=takes_channels_last(predictor))
+    data = to_host([r.boxes.data for r in predictor(inputs)])[0]
+    data[:, :4] = regions[0].normalize_boxes(data[:, :4])
+    return data
+
+
+def compare(reference: np.ndarray, candidate: np.ndarray) -> tuple[bool, str]:
+    """Pair boxes by IoU; all must pair up with the same class above MIN_IOU."""
+    if len(reference) != len(candidate):
+        return False, f"{len(reference)} boxes vs {len(candidate)}"
+    if not len(reference):
+        return True, "no boxes on either side"
+    iou = iou_matrix(reference[:, :4], candidate[:, :4])
+    rows, cols = linear_sum_assignment(-iou)
+    worst = float(iou[rows, cols].min())
+    same_cls = bool(np.all(reference[rows, 5] == candidate[cols, 5]))
+    ok = same_cls and worst >= MIN_IOU
+    return ok, f"{len(reference)} boxes, min IoU {worst:.3f}{'' if same_cls else ', class mismatch'}"
+
+
+def load_frame(image: Path | None) -> np.ndarray:
+    if image is not None:
+        frame = cv2.imread(str(image))
+        if frame is None:
+            raise SystemExit(f"Could not read {image}")
+        return frame
+    videos = sorted(VIDEOS_DIR.glob("*.mp4"))
+    if not videos:
+        raise SystemExit(f"No videos found in {VIDEOS_DIR}; pass --image")
+    return sample_frames(str(videos[0]), 1)[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare TensorRT engines with their .pt weights")
+    parser.add_argument(
+        "--image", type=Path, default=None,
+        help="Frame to test on (default: first sampled frame of the first video)"
+    )
+    parser.add_argument(
+        "--models", nargs="+", choices=sorted(TARGETS), default=sorted(TARGETS),
+        help="Which detector weights to check (default: all)"
+    )
+    parser.add_argument(
+        "--conf", type=float, default=0.25,
+        help="Confidence threshold for both runs (default: 0.25)"
+    )
+    args = parser.parse_args()
+
+    if not DETECTION_DEVICE.startswith("cuda"):
+        raise SystemExit(f"Engines only run on CUDA (DETECTION_DEVICE={DETECTION_DEVICE})")
+
+    from ultralytics import YOLO
+
+    frame = load_frame(args.image)
+    failed = False
+    for tag in args.models:
+        weights = TARGETS[tag]
+        engines = [p for p in (int8_engine_path(weights), fp16_engine_path(weights)) if p.exists()]
+        if not weights.exists() or not engines:
+            print(f"  [{tag}] no weights or no engine — skipping")
+            continue
+
+        model = YOLO(str(weights))
+        model.to(DETECTION_DEVICE)
+        reference = run_boxes(model, frame, args.conf)
+        for engine in engines:
+            ok, detail = compare(reference, run_boxes(YOLO(str(engine)), frame, args.conf))
+            print(f"  [{tag}] {engine.name}: {'OK' if ok else 'MISMATCH'} ({detail})")
+            failed |= not ok
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
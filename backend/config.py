@@ -31,7 +31,15 @@ DETECTION_FPS = 1
 DETECTION_DEVICE = "mps"  # "cpu" | "mps" (Apple Silicon) | "cuda" (NVIDIA GPU)
 PERSON_CONFIDENCE_THRESHOLD = 0.25
 WEAPON_CONFIDENCE_THRESHOLD = 0.50
-MOTION_MIN_AREA = 200  # px² — contours smaller than this are noise
+MOTION_MIN_AREA = 200  # px² at native resolution — contours smaller than this are noise
+MOTION_WORK_WIDTH = 480  # frames wider than this are downscaled before MOG2
+MOTION_REFRESH_FRAMES = 30  # still feed MOG2 every Nth unchanged frame
+
+# Idle-camera gating: YOLO detectors and MOG2 skip frames that barely changed
+ACTIVITY_DIFF_THRESHOLD = 25    # gray-level delta for a thumbnail pixel to count as changed
+ACTIVITY_MIN_CHANGED_PX = 20    # changed pixels (of 160x120) needed to count as active
+ACTIVITY_HOLD_SECS = 5.0        # stay active this long after any YOLO event
+ACTIVITY_MAX_SKIP_SECS = 10.0   # force a full detector pass at least this often
 
 # --- Demo toggles ---
 # Flip any of these and uvicorn --reload picks it up in ~1 second
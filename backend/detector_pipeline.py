@@ -5,8 +5,18 @@ Replaces mock_detector.py. Provides a single coroutine:
     async def detection_loop() -> None
 
 Detectors are instantiated once at module import time (weights load at startup).
-The loop round-robins through all cameras at DETECTION_FPS, running all enabled
-detectors on each camera's latest frame.
+Each detector runs on its own DetectorWorker thread, so a slow detector never
+holds back a fast one:
+
+    producer ──▶ one drop-oldest slot per detector ──▶ workers ──out_q──▶ fusion ──▶ broadcaster
+
+Every 1/DETECTION_FPS the producer batches all online cameras' latest frames
+and offers the batch to every worker. A worker still busy with an older batch
+has that batch replaced by the newer one. The YOLO detectors only see
+cameras whose frame changed (see activity_gate.py); motion gets every
+camera plus the same per-camera changed flags. The fusion thread merges
+person events from PersonDetector and FightDetector against each other's
+last-available result, then hands everything to the broadcaster.
 
 To add a new detector:
     1. Create detectors/my_detector.py subclassing BaseDetector
@@ -15,10 +25,18 @@ To add a new detector:
 """
 import asyncio
 import logging
+import queue
+import threading
+import time
+
+import numpy as np
+from numba import njit
 
 import camera_manager
+from activity_gate import ActivityGate, FrameChange
 from config import CAMERAS, DETECTION_FPS
 from detectors import FightDetector, MotionDetector, PersonDetector, WeaponDetector
+from detectors.worker import make_worker
 from websocket_manager import manager
 
 logger = logging.getLogger(__name__)
@@ -43,124 +61,253 @@ _detectors = [
 for _d in _detectors:
     logger.info("[pipeline] %-20s %s", _d.name, "ENABLED" if _d.enabled else "DISABLED")
 
-_PER_CAMERA_SLEEP = 1.0 / DETECTION_FPS / max(len(CAMERAS), 1)
+# Heavy detectors skipped on idle cameras; motion keeps every frame so its
+# MOG2 background model stays current
+_gated_detectors = {_person_detector, _fight_detector, _weapon_detector}
+_frame_change = FrameChange()
+_activity_gate = ActivityGate()
 
+# Both emit person_detected; fusion deduplicates them per camera
+_person_sources = {_person_detector, _fight_detector}
 
-async def detection_loop() -> None:
-    """Round-robin through cameras at DETECTION_FPS per camera.
+_FRAME_INTERVAL = 1.0 / DETECTION_FPS
 
-    For each camera:
-      1. Fetch the latest cached numpy frame (non-blocking).
-      2. Run all enabled detectors sequentially in a thread executor.
-      3. Broadcast each resulting event over WebSocket.
+# Total time shutdown waits for the worker and fusion threads to finish
+_SHUTDOWN_TIMEOUT_SECS = 2.0
+
+# Person events from the other person source count as duplicates when they
+# came from a batch at most this many ticks (~1 s) away
+_FUSION_WINDOW_TICKS = max(1, DETECTION_FPS)
+
+
+async def detection_loop() -> None:
+    """Run the producer, one worker thread per enabled detector, fusion and the broadcaster.
 
-    Sleeping _PER_CAMERA_SLEEP between cameras spreads CPU load evenly
-    instead of bursting all 9 cameras' inference in a single tick.
+    Cancelling this task stops all stages; the threads are joined off the
+    event loop.
     """
-    cam_ids = [c["id"] for c in CAMERAS]
-    loop = asyncio.get_event_loop()
+    loop = asyncio.get_running_loop()
+    out_q: queue.Queue = queue.Queue()
+    write_q: asyncio.Queue = asyncio.Queue()
+
+    workers = [make_worker(d, out_q) for d in _detectors if d.enabled]
+    for worker in workers:
+        worker.start()
+    fusion = threading.Thread(
+        target=_fuse_results,
+        args=(out_q, lambda event: loop.call_soon_threadsafe(write_q.put_nowait, event)),
+        name="fusion",
+        daemon=True,
+    )
+    fusion.start()
 
     logger.info(
-        "[pipeline] Detection loop started — %d cameras @ %d fps "
-        "(%.0f ms between cameras)",
-        len(cam_ids),
+        "[pipeline] Detection loop started — %d cameras @ %d fps, %d detector workers",
+        len(CAMERAS),
         DETECTION_FPS,
-        _PER_CAMERA_SLEEP * 1000,
+        len(workers),
     )
 
+    tasks = [
+        asyncio.create_task(_produce_frames(workers)),
+        asyncio.create_task(_broadcast_events(write_q)),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Signal every thread first, then wait for them together off-loop, so
+        # a detector mid-batch never blocks the event loop
+        for worker in workers:
+            worker.stop()
+        out_q.put(None)
+        await asyncio.to_thread(_join_threads, workers, fusion)
+
+
+def _join_threads(workers: list, fusion: threading.Thread) -> None:
+    """Join the worker and fusion threads within one shared _SHUTDOWN_TIMEOUT_SECS."""
+    deadline = time.monotonic() + _SHUTDOWN_TIMEOUT_SECS
+    for worker in workers:
+        worker.join(max(0.0, deadline - time.monotonic()))
+    # Workers still running may yet put results; fusion exits at the None
+    fusion.join(max(0.0, deadline - time.monotonic()))
+
+
+async def _produce_frames(workers: list) -> None:
+    """Once per tick, offer every online camera's latest frame to each worker as one batch.
+
+    Batching lets each YOLO detector run a single forward pass per tick
+    instead of one per camera. Each frame is diffed once (FrameChange) and
+    the changed flags travel with the batch; gated detectors only get the
+    active cameras.
+    """
+    cam_ids = [c["id"] for c in CAMERAS]
+    loop = asyncio.get_running_loop()
+    next_tick = loop.time()
+    tick = 0
+
     while True:
+        batch_ids: list[str] = []
+        frames: list = []
         for cam_id in cam_ids:
             cap = camera_manager.get_capture(cam_id)
             if cap is None or not cap.online:
-                await asyncio.sleep(_PER_CAMERA_SLEEP)
                 continue
-
             frame = cap.get_latest_frame()
             if frame is None:
                 # Streamer hasn't decoded a frame yet for this camera
-                await asyncio.sleep(_PER_CAMERA_SLEEP)
                 continue
-
-            events = await loop.run_in_executor(
-                None, _run_detectors, frame, cam_id
+            batch_ids.append(cam_id)
+            frames.append(frame)
+
+        if batch_ids:
+            tick += 1
+            changed = [
+                _frame_change.changed(frame, cam_id) for frame, cam_id in zip(frames, batch_ids)
+            ]
+            active = [
+                i for i, cam_id in enumerate(batch_ids)
+                if _activity_gate.is_active(cam_id, changed[i])
+            ]
+            active_batch = (
+                tick,
+                [batch_ids[i] for i in active],
+                [frames[i] for i in active],
+                [changed[i] for i in active],
             )
+            full_batch = (tick, batch_ids, frames, changed)
+            for worker in workers:
+                if worker.detector not in _gated_detectors:
+                    worker.submit(full_batch)
+                elif active:
+                    worker.submit(active_batch)
+
+        next_tick += _FRAME_INTERVAL
+        now = loop.time()
+        if next_tick < now:
+            next_tick = now  # fell behind — don't burst to catch up
+        await asyncio.sleep(next_tick - now)
+
+
+def _fuse_results(out_q: queue.Queue, publish) -> None:
+    """Fusion thread: take worker results as they finish and publish their events.
+
+    Person events are checked against the last ones the other person source
+    published for the same camera (within _FUSION_WINDOW_TICKS), so a person
+    seen by both YOLO11s and the pose model is reported once even though the
+    two models finish at different times.
+    """
+    # (detector, cam_id) -> (tick, person events published for that tick)
+    published: dict[tuple, tuple[int, list[dict]]] = {}
 
+    while True:
+        item = out_q.get()
+        if item is None:
+            return
+        detector, tick, events_by_cam = item
+        for cam_id, events in events_by_cam.items():
+            if not events:
+                continue
+            if detector in _gated_detectors:
+                _activity_gate.record_events(cam_id)
+            if detector in _person_sources:
+                already: list[dict] = []
+                for other in _person_sources - {detector}:
+                    sent_tick, sent = published.get((other, cam_id), (0, []))
+                    if abs(tick - sent_tick) <= _FUSION_WINDOW_TICKS:
+                        already.extend(sent)
+                events = _deduplicate_person_events(events, already)
+                published[(detector, cam_id)] = (
+                    tick, [e for e in events if e.get("event_type") == "person_detected"]
+                )
             for event in events:
-                await manager.broadcast(event)
+                publish(event)
 
-            await asyncio.sleep(_PER_CAMERA_SLEEP)
+
+async def _broadcast_events(write_q: asyncio.Queue) -> None:
+    while True:
+        event = await write_q.get()
+        await manager.broadcast(event)
 
 
 _PERSON_DEDUP_IOU_THRESHOLD = 0.5
 
 
-def _deduplicate_person_events(events: list[dict]) -> list[dict]:
+def _deduplicate_person_events(events: list[dict], published: list[dict]) -> list[dict]:
     """OR-merge person_detected events from PersonDetector and FightDetector.
 
-    For overlapping detections (IoU > threshold), keep the higher confidence one.
+    Greedy NMS: for overlapping detections (IoU > threshold), keep the higher
+    confidence one. Events in `published` have already been sent, so each of
+    them suppresses every overlapping new event, whatever the published boxes
+    overlap among themselves; they are not returned. The suppression loop is
+    compiled with Numba.
     """
     person_events = [e for e in events if e.get("event_type") == "person_detected"]
     other_events = [e for e in events if e.get("event_type") != "person_detected"]
 
-    if len(person_events) <= 1:
+    if len(person_events) + len(published) <= 1:
         for e in person_events:
             e.pop("source", None)
         return other_events + person_events
 
-    def _to_xyxy(bb: dict) -> tuple:
-        return (bb["x"], bb["y"], bb["x"] + bb["width"], bb["y"] + bb["height"])
-
-    indexed = [(e, _to_xyxy(e["bounding_box"])) for e in person_events]
+    candidates = published + person_events
+    boxes = np.array(
+        [[bb["x"], bb["y"], bb["x"] + bb["width"], bb["y"] + bb["height"]]
+         for bb in (e["bounding_box"] for e in candidates)],
+        dtype=np.float32,
+    )
+    scores = np.array([e["confidence"] for e in candidates], dtype=np.float32)
+    keep = _nms_keep(boxes, scores, _PERSON_DEDUP_IOU_THRESHOLD, len(published))
 
-    suppressed = set()
-    for i in range(len(indexed)):
-        if i in suppressed:
-            continue
-        for j in range(i + 1, len(indexed)):
-            if j in suppressed:
-                continue
-            iou = _compute_iou(indexed[i][1], indexed[j][1])
-            if iou > _PERSON_DEDUP_IOU_THRESHOLD:
-                if indexed[i][0]["confidence"] >= indexed[j][0]["confidence"]:
-                    suppressed.add(j)
-                else:
-                    suppressed.add(i)
-                    break
-
-    kept = [indexed[k][0] for k in range(len(indexed)) if k not in suppressed]
+    kept = [e for e, k in zip(person_events, keep[len(published):]) if k]
     for e in kept:
         e.pop("source", None)
 
     return other_events + kept
 
 
-def _compute_iou(box_a: tuple, box_b: tuple) -> float:
-    ax1, ay1, ax2, ay2 = box_a
-    bx1, by1, bx2, by2 = box_b
-    inter_x1, inter_y1 = max(ax1, bx1), max(ay1, by1)
-    inter_x2, inter_y2 = min(ax2, bx2), min(ay2, by2)
-    inter = max(0, inter_x2 - inter_x1) * max(0, inter_y2 - inter_y1)
-    union = (ax2 - ax1) * (ay2 - ay1) + (bx2 - bx1) * (by2 - by1) - inter
-    return inter / union if union > 1e-8 else 0.0
+@njit(cache=True, fastmath=True)
+def _overlaps(boxes: np.ndarray, areas: np.ndarray, i: int, j: int, iou_threshold: float) -> bool:
+    iw = min(boxes[i, 2], boxes[j, 2]) - max(boxes[i, 0], boxes[j, 0])
+    ih = min(boxes[i, 3], boxes[j, 3]) - max(boxes[i, 1], boxes[j, 1])
+    if iw <= 0 or ih <= 0:
+        return False
+    inter = iw * ih
+    union = areas[i] + areas[j] - inter
+    return union > 1e-8 and inter / union > iou_threshold
 
 
-def _run_detectors(frame, cam_id: str) -> list[dict]:
-    """Synchronous — runs in thread executor so YOLO doesn't block the event loop."""
-    all_events: list[dict] = []
-    for detector in _detectors:
-        if not detector.enabled:
+@njit(cache=True, fastmath=True)
+def _nms_keep(
+    boxes: np.ndarray, scores: np.ndarray, iou_threshold: float, n_fixed: int
+) -> np.ndarray:
+    """Greedy NMS over (N, 4) xyxy boxes → bool keep mask.
+
+    The first n_fixed boxes are always kept and each suppresses every later
+    box it overlaps; greedy NMS in confidence order then runs over the rest.
+    """
+    n = boxes.shape[0]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    suppressed = np.zeros(n, dtype=np.bool_)
+    keep = np.zeros(n, dtype=np.bool_)
+    for i in range(n_fixed):
+        keep[i] = True
+        for j in range(n_fixed, n):
+            if not suppressed[j] and _overlaps(boxes, areas, i, j, iou_threshold):
+                suppressed[j] = True
+    order = n_fixed + np.argsort(-scores[n_fixed:], kind="mergesort")
+    for oi in range(len(order)):
+        i = order[oi]
+        if suppressed[i]:
             continue
-        try:
-            events = detector.detect(frame, cam_id)
-            all_events.extend(events)
-
-            # After FightDetector, deduplicate person events so downstream
-            # detectors see the clean merged person list
-            if detector is _fight_detector:
-                all_events = _deduplicate_person_events(all_events)
-        except Exception as exc:
-            logger.error(
-                "[pipeline] %s raised on %s: %s",
-                detector.name, cam_id, exc, exc_info=True,
-            )
-    return all_events
+        keep[i] = True
+        for oj in range(oi + 1, len(order)):
+            j = order[oj]
+            if not suppressed[j] and _overlaps(boxes, areas, i, j, iou_threshold):
+                suppressed[j] = True
+    return keep
+
+
+# Compile now so the first detection tick doesn't pay the JIT cost
+_nms_keep(np.zeros((2, 4), dtype=np.float32), np.zeros(2, dtype=np.float32), 0.5, 1)
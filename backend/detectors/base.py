@@ -3,6 +3,22 @@ from abc import ABC, abstractmethod
 import numpy as np
 
 
+def bounding_boxes(xyxy: np.ndarray) -> list[dict]:
+    """(N,4) normalised xyxy → DetectionEvent bounding_box dicts, rounded to 4 dp.
+
+    All boxes are converted and rounded in one vectorised pass instead of four
+    Python round() calls per box.
+    """
+    xyxy = np.asarray(xyxy, dtype=np.float64)  # float32 → Python float keeps noise digits
+    xywh = np.round(np.concatenate([xyxy[:, :2], xyxy[:, 2:] - xyxy[:, :2]], axis=1), 4)
+    return [{"x": x, "y": y, "width": w, "height": h} for x, y, w, h in xywh.tolist()]
+
+
+def round_confidences(confs: np.ndarray) -> list[float]:
+    """Confidences rounded to 3 dp as Python floats."""
+    return np.round(np.asarray(confs, dtype=np.float64), 3).tolist()
+
+
 class BaseDetector(ABC):
     """Abstract base for all detection models.
 
@@ -38,3 +54,26 @@ class BaseDetector(ABC):
             Return [] when nothing is detected.
         """
         ...
+
+    def detect_batch(
+        self,
+        frames: list[np.ndarray],
+        cam_ids: list[str],
+        changed: list[bool] | None = None,
+    ) -> dict[str, list[dict]]:
+        """Run detection on one frame per camera for a pipeline tick.
+
+        Args:
+            frames:  BGR frames, one per camera, same order as cam_ids.
+            cam_ids: Camera IDs matching frames.
+            changed: Per camera, whether the frame changed since the last
+                     tick (the pipeline's shared FrameChange diff). None when
+                     unknown; detectors that don't gate on it ignore it.
+
+        Returns:
+            {cam_id: events} for every camera in cam_ids.
+
+        Default loops detect(). YOLO detectors override this to run the whole
+        batch through a single forward pass.
+        """
+        return {cam_id: self.detect(frame, cam_id) for frame, cam_id in zip(frames, cam_ids)}
@@ -12,12 +12,10 @@ False-positive reduction:
 """
 import logging
 import time
-from collections import deque
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from itertools import combinations
 
 import numpy as np
-from ultralytics import YOLO
 
 from config import (
     DETECTION_DEVICE,
@@ -31,7 +29,16 @@ from config import (
     FIGHT_SUSTAIN_FRAMES,
     FIGHT_VELOCITY_THRESHOLD,
 )
-from detectors.base import BaseDetector
+from detectors.base import BaseDetector, bounding_boxes, round_confidences
+from detectors.tracking import BoxTracks, iou_matrix
+from detectors.yolo_loader import (
+    InputRegion,
+    load_yolo,
+    make_predictor,
+    prepare_inputs,
+    takes_channels_last,
+    to_host,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -46,22 +53,25 @@ _WRIST_SHOULDER_PAIRS = [(9, 5), (10, 6)]
 _COCO_PERSON_CLASS = 0
 
 
-class _PersonPose:
-    """Intermediate representation for one detected person in a frame."""
-    __slots__ = ("bbox_norm", "bbox_xyxy_norm", "center", "diagonal",
-                 "keypoints_norm", "keypoints_conf", "confidence")
+@dataclass
+class _PoseBatch:
+    """Every detected person with keypoints in one frame, as parallel arrays."""
+    bboxes: np.ndarray    # (P, 4) normalized xyxy
+    centers: np.ndarray   # (P, 2)
+    diags: np.ndarray     # (P,)
+    kps: np.ndarray       # (P, 17, 2) normalized x, y
+    kps_conf: np.ndarray  # (P, 17)
+    confs: np.ndarray     # (P,)
+
+    def __len__(self) -> int:
+        return len(self.confs)
 
-    def __init__(self, bbox_norm: dict, bbox_xyxy_norm: tuple,
-                 keypoints_norm: np.ndarray, keypoints_conf: np.ndarray,
-                 confidence: float):
-        self.bbox_norm = bbox_norm
-        self.bbox_xyxy_norm = bbox_xyxy_norm
-        x1, y1, x2, y2 = bbox_xyxy_norm
-        self.center = ((x1 + x2) / 2, (y1 + y2) / 2)
-        self.diagonal = np.hypot(x2 - x1, y2 - y1)
-        self.keypoints_norm = keypoints_norm  # (17, 2) normalized x, y
-        self.keypoints_conf = keypoints_conf  # (17,)
-        self.confidence = confidence
+    @classmethod
+    def from_arrays(cls, bboxes: np.ndarray, kps: np.ndarray,
+                    kps_conf: np.ndarray, confs: np.ndarray) -> "_PoseBatch":
+        centers = (bboxes[:, :2] + bboxes[:, 2:]) / 2
+        diags = np.hypot(bboxes[:, 2] - bboxes[:, 0], bboxes[:, 3] - bboxes[:, 1])
+        return cls(bboxes, centers, diags, kps, kps_conf, confs)
 
 
 class FightDetector(BaseDetector):
@@ -73,22 +83,24 @@ class FightDetector(BaseDetector):
 
     def __init__(self) -> None:
         self._model = None
-        self._prev_keypoints: dict[str, list[np.ndarray]] = {}
-        self._prev_bboxes: dict[str, list[tuple]] = {}
+        self._predictor = None
+        self._prev_keypoints: dict[str, np.ndarray] = {}  # cam_id -> (P, 17, 2)
+        self._prev_bboxes: dict[str, np.ndarray] = {}     # cam_id -> (P, 4) xyxy
         self._last_fight_time: dict[str, float] = {}
         # Stable slot IDs for tracking people across frames (per camera)
-        self._next_slot: dict[str, int] = {}
-        self._prev_slots: dict[str, list[int]] = {}  # cam_id -> list of slot IDs
-        # Temporal accumulation: cam_id -> {(slot_a, slot_b) -> deque of bools}
-        self._fight_history: dict[str, dict[tuple[int, int], deque]] = {}
+        self._tracks: dict[str, BoxTracks] = {}
+        # Temporal accumulation: cam_id -> {(slot_a, slot_b) -> consecutive
+        # passing frames, capped at FIGHT_SUSTAIN_FRAMES}
+        self._fight_history: dict[str, dict[tuple[int, int], int]] = {}
 
         if not ENABLE_FIGHT_DETECTION:
             logger.info("[FightDetector] DISABLED via config")
             return
 
         logger.info("[FightDetector] Loading yolov8n-pose.pt (device=%s)...", DETECTION_DEVICE)
-        self._model = YOLO("yolov8n-pose.pt")
-        self._model.to(DETECTION_DEVICE)
+        self._model = load_yolo("yolov8n-pose.pt")
+        self._predictor = make_predictor(self._model, conf=FIGHT_POSE_CONFIDENCE_THRESHOLD)
+        self._channels_last = takes_channels_last(self._predictor)
         logger.info(
             "[FightDetector] Ready (pose_conf=%.2f, min_criteria=%d)",
             FIGHT_POSE_CONFIDENCE_THRESHOLD,
@@ -104,66 +116,70 @@ class FightDetector(BaseDetector):
         return ENABLE_FIGHT_DETECTION and self._model is not None
 
     def detect(self, frame: np.ndarray, cam_id: str) -> list[dict]:
-        if not self.enabled:
-            return []
-
-        h, w = frame.shape[:2]
-        results = self._model(
-            frame,
-            conf=FIGHT_POSE_CONFIDENCE_THRESHOLD,
-            verbose=False,
-        )
-
-        poses: list[_PersonPose] = []
-        person_events: list[dict] = []
+        return self.detect_batch([frame], [cam_id])[cam_id]
+
+    def detect_batch(
+        self,
+        frames: list[np.ndarray],
+        cam_ids: list[str],
+        changed: list[bool] | None = None,
+    ) -> dict[str, list[dict]]:
+        if not self.enabled or not frames:
+            return {cam_id: [] for cam_id in cam_ids}
+
+        # One pose forward pass for every camera in the tick
+        inputs, regions = prepare_inputs(frames, channels_last=self._channels_last)
+        results = self._predictor(inputs)
+
+        # One device→host copy each for every camera's boxes and keypoints
+        box_data = to_host([r.boxes.data for r in results])
+        kp_data = to_host([
+            r.keypoints.data if r.keypoints is not None else r.boxes.data.new_zeros((0, 17, 3))
+            for r in results
+        ])
+        return {
+            cam_id: self._analyse(boxes, kps, region, cam_id)
+            for cam_id, boxes, kps, region in zip(cam_ids, box_data, kp_data, regions)
+        }
+
+    def _analyse(
+        self, box_data: np.ndarray, kp_data: np.ndarray, region: InputRegion, cam_id: str
+    ) -> list[dict]:
+        """Build person events and run the fight heuristics for one camera.
+
+        box_data is (N, 6) x1 y1 x2 y2 conf cls and kp_data (N, 17, 3), both in
+        model-input pixels.
+        """
         now_iso = datetime.now(timezone.utc).isoformat()
 
-        for result in results:
-            if result.keypoints is None or result.boxes is None:
-                continue
-            kp_data = result.keypoints.data  # (N, 17, 3)
-            boxes = result.boxes
-
-            for i, box in enumerate(boxes):
-                if int(box.cls[0]) != _COCO_PERSON_CLASS:
-                    continue
-
-                conf = float(box.conf[0])
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-
-                bbox_norm = {
-                    "x":      round(x1 / w, 4),
-                    "y":      round(y1 / h, 4),
-                    "width":  round((x2 - x1) / w, 4),
-                    "height": round((y2 - y1) / h, 4),
-                }
-                bbox_xyxy_norm = (x1 / w, y1 / h, x2 / w, y2 / h)
-
-                person_events.append({
-                    "camera_id": cam_id,
-                    "event_type": "person_detected",
-                    "timestamp": now_iso,
-                    "confidence": round(conf, 3),
-                    "bounding_box": bbox_norm,
-                    "source": "fight_detector",
-                })
-
-                if i < kp_data.shape[0]:
-                    kp = kp_data[i].cpu().numpy()  # (17, 3)
-                    kp_xy = kp[:, :2].copy()
-                    kp_xy[:, 0] /= w
-                    kp_xy[:, 1] /= h
-                    kp_conf = kp[:, 2]
-                    poses.append(_PersonPose(
-                        bbox_norm=bbox_norm,
-                        bbox_xyxy_norm=bbox_xyxy_norm,
-                        keypoints_norm=kp_xy,
-                        keypoints_conf=kp_conf,
-                        confidence=conf,
-                    ))
+        is_person = box_data[:, 5].astype(int) == _COCO_PERSON_CLASS
+        xyxy = region.normalize_boxes(box_data[is_person, :4])
+        confs = box_data[is_person, 4]
+
+        person_events = [
+            {
+                "camera_id": cam_id,
+                "event_type": "person_detected",
+                "timestamp": now_iso,
+                "confidence": conf,
+                "bounding_box": box,
+                "source": "fight_detector",
+            }
+            for box, conf in zip(bounding_boxes(xyxy), round_confidences(confs))
+        ]
+
+        person_idx = np.flatnonzero(is_person)
+        with_kps = person_idx < kp_data.shape[0]
+        kp = kp_data[person_idx[with_kps]]
+        poses = _PoseBatch.from_arrays(
+            bboxes=xyxy[with_kps],
+            kps=region.normalize_points(kp[:, :, :2]),
+            kps_conf=kp[:, :, 2],
+            confs=confs[with_kps],
+        )
 
         # --- Assign stable slot IDs via IoU matching to previous frame ---
-        slots = self._assign_slots(cam_id, poses)
+        slots = self._assign_slots(cam_id, poses.bboxes)
 
         # --- Fight heuristic analysis (requires 2+ people with poses) ---
         fight_events: list[dict] = []
@@ -177,57 +193,46 @@ class FightDetector(BaseDetector):
         active_pairs: set[tuple[int, int]] = set()
 
         if len(poses) >= 2:
-            velocities = self._compute_velocities(cam_id, poses)
-
-            for idx_a, idx_b in combinations(range(len(poses)), 2):
-                pa, pb = poses[idx_a], poses[idx_b]
-
-                # Proximity is mandatory — skip pair if not close
-                if not self._check_proximity(pa, pb):
-                    continue
-
-                # Count remaining 3 criteria
-                criteria_met = 0
-                criteria_details = []
-
-                if self._check_arm_intrusion(pa, pb):
-                    criteria_met += 1
-                    criteria_details.append("arm_intrusion")
-
-                vel_a = velocities[idx_a] if velocities else 0.0
-                vel_b = velocities[idx_b] if velocities else 0.0
-                if max(vel_a, vel_b) > FIGHT_VELOCITY_THRESHOLD:
-                    criteria_met += 1
-                    criteria_details.append("rapid_movement")
-
-                if self._check_aggressive_posture(pa) or self._check_aggressive_posture(pb):
-                    criteria_met += 1
-                    criteria_details.append("aggressive_posture")
-
-                passed = criteria_met >= FIGHT_MIN_CRITERIA
-
-                # Push to temporal ring buffer for this pair
+            # Evaluate every heuristic for all people at once: (P,P) / (P,) arrays
+            proximity = _proximity_matrix(poses.centers, poses.diags)
+            arm_intrusion = _arm_intrusion_matrix(poses.kps, poses.kps_conf, poses.bboxes)
+            posture = _aggressive_posture(poses.kps, poses.kps_conf)
+            fast = self._compute_velocities(
+                cam_id, poses.bboxes, poses.kps, poses.kps_conf
+            ) > FIGHT_VELOCITY_THRESHOLD
+
+            fast_pair = fast[:, None] | fast[None]
+            posture_pair = posture[:, None] | posture[None]
+            criteria_count = (
+                arm_intrusion.astype(int) + fast_pair.astype(int) + posture_pair.astype(int)
+            )
+            # Proximity is mandatory. A close pair that misses the criteria
+            # breaks its sustain run, which is the same as dropping its history,
+            # so only passing pairs are visited (in combinations() order).
+            passed_pairs = np.argwhere(np.triu(proximity & (criteria_count >= FIGHT_MIN_CRITERIA), 1))
+
+            for idx_a, idx_b in passed_pairs.tolist():
+                criteria_met = int(criteria_count[idx_a, idx_b])
+
+                # Extend this pair's run of consecutive passing frames
                 pair_key = (min(slots[idx_a], slots[idx_b]),
                             max(slots[idx_a], slots[idx_b]))
                 active_pairs.add(pair_key)
 
-                if pair_key not in history:
-                    history[pair_key] = deque(maxlen=FIGHT_SUSTAIN_FRAMES)
-                history[pair_key].append(passed)
+                run = min(history.get(pair_key, 0) + 1, FIGHT_SUSTAIN_FRAMES)
+                history[pair_key] = run
 
                 # Only fire if sustained across FIGHT_SUSTAIN_FRAMES consecutive frames
-                buf = history[pair_key]
-                if len(buf) == FIGHT_SUSTAIN_FRAMES and all(buf):
+                if run == FIGHT_SUSTAIN_FRAMES:
                     now_mono = time.monotonic()
                     if now_mono - self._last_fight_time.get(cam_id, 0) >= FIGHT_EVENT_COOLDOWN_SECS:
                         self._last_fight_time[cam_id] = now_mono
-                        base_conf = min(pa.confidence, pb.confidence)
+                        base_conf = float(min(poses.confs[idx_a], poses.confs[idx_b]))
                         fight_conf = min(0.95, base_conf + (criteria_met - FIGHT_MIN_CRITERIA) * 0.15)
 
-                        merged_x1 = min(pa.bbox_xyxy_norm[0], pb.bbox_xyxy_norm[0])
-                        merged_y1 = min(pa.bbox_xyxy_norm[1], pb.bbox_xyxy_norm[1])
-                        merged_x2 = max(pa.bbox_xyxy_norm[2], pb.bbox_xyxy_norm[2])
-                        merged_y2 = max(pa.bbox_xyxy_norm[3], pb.bbox_xyxy_norm[3])
+                        pair_boxes = poses.bboxes[[idx_a, idx_b]]
+                        merged_x1, merged_y1 = pair_boxes[:, :2].min(axis=0).tolist()
+                        merged_x2, merged_y2 = pair_boxes[:, 2:].max(axis=0).tolist()
 
                         fight_events.append({
                             "camera_id": cam_id,
@@ -241,6 +246,13 @@ class FightDetector(BaseDetector):
                                 "height": round(merged_y2 - merged_y1, 4),
                             },
                         })
+                        criteria_details = [
+                            name for name, hit in (
+                                ("arm_intrusion", arm_intrusion[idx_a, idx_b]),
+                                ("rapid_movement", fast_pair[idx_a, idx_b]),
+                                ("aggressive_posture", posture_pair[idx_a, idx_b]),
+                            ) if hit
+                        ]
                         logger.info(
                             "[FightDetector] FIGHT on %s (conf=%.2f, criteria=%s, sustained=%d frames)",
                             cam_id, fight_conf, ["proximity"] + criteria_details, FIGHT_SUSTAIN_FRAMES,
@@ -253,135 +265,76 @@ class FightDetector(BaseDetector):
             del history[k]
 
         # Update per-camera state for next frame
-        self._prev_keypoints[cam_id] = [p.keypoints_norm for p in poses]
-        self._prev_bboxes[cam_id] = [p.bbox_xyxy_norm for p in poses]
-        self._prev_slots[cam_id] = slots
+        self._prev_keypoints[cam_id] = poses.kps
+        self._prev_bboxes[cam_id] = poses.bboxes
 
         return person_events + fight_events
 
     # ── Slot assignment for stable person tracking ─────────────────────
 
-    def _assign_slots(self, cam_id: str, poses: list[_PersonPose]) -> list[int]:
-        """Assign stable integer slot IDs to each person by IoU-matching to previous frame."""
-        prev_bbs = self._prev_bboxes.get(cam_id, [])
-        prev_slots = self._prev_slots.get(cam_id, [])
-
-        if cam_id not in self._next_slot:
-            self._next_slot[cam_id] = 0
-
-        if not prev_bbs or not prev_slots:
-            # First frame for this camera — assign fresh slots
-            slots = []
-            for _ in poses:
-                slots.append(self._next_slot[cam_id])
-                self._next_slot[cam_id] += 1
-            return slots
-
-        # Match each current person to previous person by best IoU
-        used_prev = set()
-        slots = [None] * len(poses)
-
-        for i, pose in enumerate(poses):
-            best_iou = 0.3  # minimum IoU to count as same person
-            best_j = -1
-            for j, prev_bb in enumerate(prev_bbs):
-                if j in used_prev:
-                    continue
-                iou = _compute_iou_xyxy(pose.bbox_xyxy_norm, prev_bb)
-                if iou > best_iou:
-                    best_iou = iou
-                    best_j = j
-
-            if best_j >= 0:
-                slots[i] = prev_slots[best_j]
-                used_prev.add(best_j)
-
-        # Assign new slots for unmatched people
-        for i in range(len(slots)):
-            if slots[i] is None:
-                slots[i] = self._next_slot[cam_id]
-                self._next_slot[cam_id] += 1
-
-        return slots
+    def _assign_slots(self, cam_id: str, bboxes: np.ndarray) -> list[int]:
+        """Assign stable integer slot IDs to each person via Kalman-predicted tracks."""
+        if cam_id not in self._tracks:
+            self._tracks[cam_id] = BoxTracks()
+        return self._tracks[cam_id].step(bboxes)
 
     # ── Heuristic helpers ────────────────────────────────────────────────
 
-    def _check_proximity(self, pa: _PersonPose, pb: _PersonPose) -> bool:
-        dist = np.hypot(pa.center[0] - pb.center[0], pa.center[1] - pb.center[1])
-        avg_diag = (pa.diagonal + pb.diagonal) / 2
-        if avg_diag < 1e-6:
-            return False
-        return (dist / avg_diag) < FIGHT_PROXIMITY_RATIO
-
-    def _check_arm_intrusion(self, pa: _PersonPose, pb: _PersonPose) -> bool:
-        margin = FIGHT_ARM_INTRUSION_MARGIN
-        for person, target in [(pa, pb), (pb, pa)]:
-            tx1, ty1, tx2, ty2 = target.bbox_xyxy_norm
-            tx1 -= margin
-            ty1 -= margin
-            tx2 += margin
-            ty2 += margin
-            for wi in _WRIST_INDICES:
-                if person.keypoints_conf[wi] < FIGHT_KEYPOINT_CONFIDENCE_MIN:
-                    continue
-                wx, wy = person.keypoints_norm[wi]
-                if tx1 <= wx <= tx2 and ty1 <= wy <= ty2:
-                    return True
-        return False
-
-    def _check_aggressive_posture(self, person: _PersonPose) -> bool:
-        for wrist_idx, shoulder_idx in _WRIST_SHOULDER_PAIRS:
-            if (person.keypoints_conf[wrist_idx] < FIGHT_KEYPOINT_CONFIDENCE_MIN or
-                    person.keypoints_conf[shoulder_idx] < FIGHT_KEYPOINT_CONFIDENCE_MIN):
-                continue
-            if person.keypoints_norm[wrist_idx, 1] < person.keypoints_norm[shoulder_idx, 1]:
-                return True
-        return False
-
-    def _compute_velocities(self, cam_id: str, current_poses: list[_PersonPose]) -> list[float]:
-        prev_kps = self._prev_keypoints.get(cam_id, [])
-        prev_bbs = self._prev_bboxes.get(cam_id, [])
-
-        if not prev_kps or not prev_bbs:
-            return [0.0] * len(current_poses)
-
-        velocities = []
-        for pose in current_poses:
-            best_iou = 0.0
-            best_prev_kp = None
-            for prev_bb, prev_kp in zip(prev_bbs, prev_kps):
-                iou = _compute_iou_xyxy(pose.bbox_xyxy_norm, prev_bb)
-                if iou > best_iou:
-                    best_iou = iou
-                    best_prev_kp = prev_kp
-
-            if best_prev_kp is None or best_iou < 0.2:
-                velocities.append(0.0)
-                continue
-
-            max_vel = 0.0
-            for li in _LIMB_INDICES:
-                if pose.keypoints_conf[li] < FIGHT_KEYPOINT_CONFIDENCE_MIN:
-                    continue
-                dx = pose.keypoints_norm[li, 0] - best_prev_kp[li, 0]
-                dy = pose.keypoints_norm[li, 1] - best_prev_kp[li, 1]
-                vel = np.hypot(dx, dy)
-                if vel > max_vel:
-                    max_vel = vel
-            velocities.append(max_vel)
+    def _compute_velocities(
+        self, cam_id: str, bboxes: np.ndarray, kps: np.ndarray, kps_conf: np.ndarray
+    ) -> np.ndarray:
+        """Max limb keypoint displacement per person vs. their best-IoU previous pose → (P,)."""
+        prev_kps = self._prev_keypoints.get(cam_id)
+        prev_bbs = self._prev_bboxes.get(cam_id)
+
+        velocities = np.zeros(len(bboxes))
+        if prev_kps is None or not len(prev_kps):
+            return velocities
 
+        iou = iou_matrix(bboxes, prev_bbs)
+        best_j = iou.argmax(axis=1)
+        matched = iou[np.arange(len(bboxes)), best_j] >= 0.2
+
+        limb_ok = kps_conf[:, _LIMB_INDICES] >= FIGHT_KEYPOINT_CONFIDENCE_MIN  # (P, limbs)
+        disp = np.linalg.norm(
+            kps[:, _LIMB_INDICES] - prev_kps[best_j][:, _LIMB_INDICES], axis=-1
+        )
+        disp = np.where(limb_ok, disp, 0.0).max(axis=1)
+        valid = matched & limb_ok.any(axis=1)
+        velocities[valid] = disp[valid]
         return velocities
 
 
-def _compute_iou_xyxy(box_a: tuple, box_b: tuple) -> float:
-    ax1, ay1, ax2, ay2 = box_a
-    bx1, by1, bx2, by2 = box_b
-    inter_x1 = max(ax1, bx1)
-    inter_y1 = max(ay1, by1)
-    inter_x2 = min(ax2, bx2)
-    inter_y2 = min(ay2, by2)
-    inter = max(0, inter_x2 - inter_x1) * max(0, inter_y2 - inter_y1)
-    area_a = (ax2 - ax1) * (ay2 - ay1)
-    area_b = (bx2 - bx1) * (by2 - by1)
-    union = area_a + area_b - inter
-    return inter / union if union > 1e-8 else 0.0
+def _proximity_matrix(centers: np.ndarray, diagonals: np.ndarray) -> np.ndarray:
+    """(P,P) bool: center distance / mean bbox diagonal < FIGHT_PROXIMITY_RATIO."""
+    dist = np.linalg.norm(centers[:, None] - centers[None], axis=-1)
+    avg_diag = (diagonals[:, None] + diagonals[None]) / 2
+    return (avg_diag >= 1e-6) & (dist < FIGHT_PROXIMITY_RATIO * avg_diag)
+
+
+def _arm_intrusion_matrix(kps: np.ndarray, kps_conf: np.ndarray, bboxes: np.ndarray) -> np.ndarray:
+    """(P,P) bool: a confident wrist of either person lies in the other's (padded) bbox."""
+    margin = FIGHT_ARM_INTRUSION_MARGIN
+    wx = kps[:, _WRIST_INDICES, 0][:, :, None]  # (P, wrists, 1)
+    wy = kps[:, _WRIST_INDICES, 1][:, :, None]
+    x1, y1, x2, y2 = (bboxes[:, k][None, None] for k in range(4))  # (1, 1, P)
+    inside = (
+        (wx >= x1 - margin) & (wx <= x2 + margin)
+        & (wy >= y1 - margin) & (wy <= y2 + margin)
+        & (kps_conf[:, _WRIST_INDICES] >= FIGHT_KEYPOINT_CONFIDENCE_MIN)[:, :, None]
+    ).any(axis=1)  # person's wrist in target's box → (P, P)
+    return inside | inside.T
+
+
+def _aggressive_posture(kps: np.ndarray, kps_conf: np.ndarray) -> np.ndarray:
+    """(P,) bool: a confident wrist raised above its shoulder."""
+    wrists, shoulders = zip(*_WRIST_SHOULDER_PAIRS)
+    wrists, shoulders = list(wrists), list(shoulders)
+    confident = (
+        (kps_conf[:, wrists] >= FIGHT_KEYPOINT_CONFIDENCE_MIN)
+        & (kps_conf[:, shoulders] >= FIGHT_KEYPOINT_CONFIDENCE_MIN)
+    )
+    raised = kps[:, wrists, 1] < kps[:, shoulders, 1]
+    return (confident & raised).any(axis=1)
+
+
@@ -1,19 +1,32 @@
 import logging
 from datetime import datetime, timezone
+from functools import lru_cache
 
 import cv2
 import numpy as np
 
-from config import ENABLE_MOTION_DETECTION, MOTION_MIN_AREA
-from detectors.base import BaseDetector
+from config import (
+    ENABLE_MOTION_DETECTION,
+    MOTION_MIN_AREA,
+    MOTION_REFRESH_FRAMES,
+    MOTION_WORK_WIDTH,
+)
+from detectors.base import BaseDetector, bounding_boxes, round_confidences
 
 logger = logging.getLogger(__name__)
 
 # Small kernel: removes salt-and-pepper noise from camera shake
-_NOISE_KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+_NOISE_KERNEL_PX = 5
 # Large kernel: merges nearby fragments (bus body, windows, shadow edges)
 # into one big blob so the bus registers as a single large contour
-_MERGE_KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (25, 25))
+_MERGE_KERNEL_PX = 25
+
+
+@lru_cache(maxsize=None)
+def _kernel(native_px: int, scale: float) -> np.ndarray:
+    """Elliptical kernel covering native_px pixels of the native-resolution frame."""
+    size = max(3, round(native_px * scale) | 1)  # odd, so it stays centred
+    return cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (size, size))
 
 
 class MotionDetector(BaseDetector):
@@ -25,6 +38,9 @@ class MotionDetector(BaseDetector):
 
     def __init__(self) -> None:
         self._subtractors: dict[str, cv2.BackgroundSubtractorMOG2] = {}
+        self._static_frames: dict[str, int] = {}
+        # Per-camera (mask, work) uint8 buffers reused by MOG2 and morphology
+        self._scratch: dict[str, tuple[np.ndarray, np.ndarray]] = {}
         logger.info(
             "[MotionDetector] Ready (min_area=%d px²)", MOTION_MIN_AREA
         )
@@ -37,53 +53,126 @@ class MotionDetector(BaseDetector):
     def enabled(self) -> bool:
         return ENABLE_MOTION_DETECTION
 
-    def _subtractor(self, cam_id: str) -> cv2.BackgroundSubtractorMOG2:
-        if cam_id not in self._subtractors:
-            self._subtractors[cam_id] = cv2.createBackgroundSubtractorMOG2(
-                history=500,
-                varThreshold=25,     # higher = less sensitive to camera shake
-                detectShadows=False,
-            )
-        return self._subtractors[cam_id]
+    def _seed_subtractor(self, cam_id: str, frame: np.ndarray) -> None:
+        """Create cam_id's subtractor with `frame` as its initial background.
+
+        A fresh MOG2 has no background model and marks its whole first frame
+        as foreground, which would surface as one frame-sized motion event
+        (and a worst-case contour pass). Learning the first frame outright
+        avoids that; that frame itself reports no motion.
+        """
+        sub = cv2.createBackgroundSubtractorMOG2(
+            history=500,
+            varThreshold=25,     # higher = less sensitive to camera shake
+            detectShadows=False,
+        )
+        sub.apply(frame, learningRate=1.0)
+        self._subtractors[cam_id] = sub
+
+    def _scratch_buffers(self, cam_id: str, h: int, w: int) -> tuple[np.ndarray, np.ndarray]:
+        buffers = self._scratch.get(cam_id)
+        if buffers is None or buffers[0].shape != (h, w):
+            buffers = (np.empty((h, w), np.uint8), np.empty((h, w), np.uint8))
+            self._scratch[cam_id] = buffers
+        return buffers
+
+    def _skip_static(self, cam_id: str) -> bool:
+        """Count one unchanged frame for cam_id; True if MOG2 can skip it.
+
+        Lets idle cameras skip MOG2, morphology and findContours. Every
+        MOTION_REFRESH_FRAMES-th unchanged frame still goes through so the
+        background model stays current for when activity resumes.
+        """
+        skipped = self._static_frames.get(cam_id, 0) + 1
+        if skipped >= MOTION_REFRESH_FRAMES:
+            self._static_frames[cam_id] = 0
+            return False
+        self._static_frames[cam_id] = skipped
+        return True
+
+    def detect_batch(
+        self,
+        frames: list[np.ndarray],
+        cam_ids: list[str],
+        changed: list[bool] | None = None,
+    ) -> dict[str, list[dict]]:
+        """detect() per camera, skipping frames the pipeline's FrameChange saw as unchanged."""
+        if changed is None:
+            changed = [True] * len(cam_ids)
+        events_by_cam: dict[str, list[dict]] = {}
+        for frame, cam_id, frame_changed in zip(frames, cam_ids, changed):
+            if not frame_changed and self._skip_static(cam_id):
+                events_by_cam[cam_id] = []
+                continue
+            if frame_changed:
+                self._static_frames[cam_id] = 0
+            events_by_cam[cam_id] = self.detect(frame, cam_id)
+        return events_by_cam
 
     def detect(self, frame: np.ndarray, cam_id: str) -> list[dict]:
         if not self.enabled:
             return []
         h, w = frame.shape[:2]
 
-        fg_mask = self._subtractor(cam_id).apply(frame, learningRate=-1)
+        # MOG2 and the morphology cost O(pixels): work on a downscaled copy,
+        # with kernels and MOTION_MIN_AREA scaled to match
+        scale = 1.0
+        if w > MOTION_WORK_WIDTH:
+            scale = round(MOTION_WORK_WIDTH / w, 3)
+            h, w = round(h * scale), MOTION_WORK_WIDTH
+            frame = cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)
+
+        min_area = MOTION_MIN_AREA * scale * scale
+
+        subtractor = self._subtractors.get(cam_id)
+        if subtractor is None:
+            self._seed_subtractor(cam_id, frame)
+            return []
+
+        merge_kernel = _kernel(_MERGE_KERNEL_PX, scale)
+
+        fg_mask, work = self._scratch_buffers(cam_id, h, w)
+        subtractor.apply(frame, fgmask=fg_mask, learningRate=-1)
 
         # Step 1: remove tiny noise specks from camera shake
-        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, _NOISE_KERNEL)
+        cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, _kernel(_NOISE_KERNEL_PX, scale), dst=work)
 
         # Step 2: dilate heavily to merge fragmented object parts
         # (bus body + windows + shadow edges → one solid blob)
-        fg_mask = cv2.dilate(fg_mask, _MERGE_KERNEL, iterations=2)
+        cv2.dilate(work, merge_kernel, dst=fg_mask, iterations=2)
 
         # Step 3: fill any remaining holes inside blobs
-        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, _MERGE_KERNEL)
+        cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, merge_kernel, dst=work)
+        fg_mask = work
 
         contours, _ = cv2.findContours(
             fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
         )
 
-        events: list[dict] = []
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area < MOTION_MIN_AREA:
-                continue
-            px, py, cw, ch = cv2.boundingRect(contour)
-            confidence = min(0.95, area / (w * h) * 20)
-            events.append({
+        if not contours:
+            return []
+
+        # Area-filter first so boundingRect only runs on surviving blobs
+        areas = np.fromiter(
+            (cv2.contourArea(c) for c in contours), dtype=np.float64, count=len(contours)
+        )
+        keep = np.flatnonzero(areas >= min_area)
+        if not len(keep):
+            return []
+        xyxy = np.array([cv2.boundingRect(contours[i]) for i in keep], dtype=np.float64)
+        xyxy[:, 2:] += xyxy[:, :2]
+        inv_w, inv_h = 1.0 / w, 1.0 / h
+        xyxy *= np.array([inv_w, inv_h, inv_w, inv_h])
+        confidences = np.minimum(0.95, areas[keep] * (inv_w * inv_h * 20))
+
+        now_iso = datetime.now(timezone.utc).isoformat()
+        return [
+            {
                 "camera_id": cam_id,
                 "event_type": "motion",
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "confidence": round(confidence, 3),
-                "bounding_box": {
-                    "x":      round(px / w, 4),
-                    "y":      round(py / h, 4),
-                    "width":  round(cw / w, 4),
-                    "height": round(ch / h, 4),
-                },
-            })
-        return events
+                "timestamp": now_iso,
+                "confidence": confidence,
+                "bounding_box": box,
+            }
+            for box, confidence in zip(bounding_boxes(xyxy), round_confidences(confidences))
+        ]
@@ -2,10 +2,16 @@ import logging
 from datetime import datetime, timezone
 
 import numpy as np
-from ultralytics import YOLO
 
 from config import DETECTION_DEVICE, ENABLE_PERSON_DETECTION, MODEL_DIR, PERSON_CONFIDENCE_THRESHOLD
-from detectors.base import BaseDetector
+from detectors.base import BaseDetector, bounding_boxes, round_confidences
+from detectors.yolo_loader import (
+    load_yolo,
+    make_predictor,
+    prepare_inputs,
+    takes_channels_last,
+    to_host,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -26,10 +32,14 @@ class PersonDetector(BaseDetector):
         if not ENABLE_PERSON_DETECTION:
             logger.info("[PersonDetector] DISABLED via config")
             self._model = None
+            self._predictor = None
             return
         logger.info("[PersonDetector] Loading %s (device=%s)...", _WEIGHTS, DETECTION_DEVICE)
-        self._model = YOLO(str(_WEIGHTS))
-        self._model.to(DETECTION_DEVICE)
+        self._model = load_yolo(_WEIGHTS)
+        self._predictor = make_predictor(
+            self._model, conf=PERSON_CONFIDENCE_THRESHOLD, classes=[_COCO_PERSON_CLASS]
+        )
+        self._channels_last = takes_channels_last(self._predictor)
         logger.info(
             "[PersonDetector] Ready (confidence threshold=%.2f)",
             PERSON_CONFIDENCE_THRESHOLD,
@@ -44,29 +54,34 @@ class PersonDetector(BaseDetector):
         return ENABLE_PERSON_DETECTION and self._model is not None
 
     def detect(self, frame: np.ndarray, cam_id: str) -> list[dict]:
-        if not self.enabled:
-            return []
-        h, w = frame.shape[:2]
-        results = self._model(
-            frame,
-            conf=PERSON_CONFIDENCE_THRESHOLD,
-            classes=[_COCO_PERSON_CLASS],
-            verbose=False,
-        )
-        events: list[dict] = []
-        for result in results:
-            for box in result.boxes:
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                events.append({
+        return self.detect_batch([frame], [cam_id])[cam_id]
+
+    def detect_batch(
+        self,
+        frames: list[np.ndarray],
+        cam_ids: list[str],
+        changed: list[bool] | None = None,
+    ) -> dict[str, list[dict]]:
+        if not self.enabled or not frames:
+            return {cam_id: [] for cam_id in cam_ids}
+
+        # One forward pass for every camera in the tick
+        inputs, regions = prepare_inputs(frames, channels_last=self._channels_last)
+        results = self._predictor(inputs)
+        now_iso = datetime.now(timezone.utc).isoformat()
+        events_by_cam: dict[str, list[dict]] = {}
+        # (n, 6) x1 y1 x2 y2 conf cls per camera, one device→host copy
+        box_data = to_host([r.boxes.data for r in results])
+        for cam_id, data, region in zip(cam_ids, box_data, regions):
+            boxes = bounding_boxes(region.normalize_boxes(data[:, :4]))
+            events_by_cam[cam_id] = [
+                {
                     "camera_id": cam_id,
                     "event_type": "person_detected",
-                    "timestamp": datetime.now(timezone.utc).isoformat(),
-                    "confidence": round(float(box.conf[0]), 3),
-                    "bounding_box": {
-                        "x":      round(x1 / w, 4),
-                        "y":      round(y1 / h, 4),
-                        "width":  round((x2 - x1) / w, 4),
-                        "height": round((y2 - y1) / h, 4),
-                    },
-                })
-        return events
+                    "timestamp": now_iso,
+                    "confidence": conf,
+                    "bounding_box": box,
+                }
+                for box, conf in zip(boxes, round_confidences(data[:, 4]))
+            ]
+        return events_by_cam
@@ -0,0 +1,92 @@
+"""
+tracking.py — Per-camera person tracks for FightDetector's stable slot IDs.
+
+SORT-style: each track is a constant-velocity Kalman filter over the box
+centre and size. Every frame the tracks are predicted forward, matched to
+the new detections by Hungarian assignment on IoU, and corrected with the
+matched boxes. Predicting first keeps a fast-moving person (the typical fight
+case) on the same slot where plain last-frame IoU would lose them.
+
+All filters of a camera advance together as batched NumPy arrays.
+"""
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# State: [cx, cy, w, h, vcx, vcy, vw, vh], normalized 0-1 frame units per tick
+_F = np.eye(8)
+_F[:4, 4:] = np.eye(4)
+_H = np.eye(4, 8)
+_Q = np.diag([1e-4] * 4 + [1e-3] * 4)   # process noise
+_R = np.eye(4) * 1e-4                   # measurement noise (~1% of frame)
+_P0 = np.diag([1e-4] * 4 + [1e-2] * 4)  # new tracks: position known, velocity not
+
+_MAX_MATCH_COST = 0.7  # 1 - IoU: predicted and detected box must overlap > 0.3
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """(N,4) x (M,4) xyxy boxes → (N,M) IoU."""
+    ix1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    iy1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    ix2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    iy2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 1e-8, inter / np.maximum(union, 1e-8), 0.0)
+
+
+def _xyxy_to_z(boxes: np.ndarray) -> np.ndarray:
+    wh = boxes[:, 2:] - boxes[:, :2]
+    return np.concatenate([boxes[:, :2] + wh / 2, wh], axis=1)
+
+
+def _z_to_xyxy(z: np.ndarray) -> np.ndarray:
+    half = np.maximum(z[:, 2:4], 0.0) / 2
+    return np.concatenate([z[:, :2] - half, z[:, :2] + half], axis=1)
+
+
+class BoxTracks:
+    """Kalman tracks for one camera. A track lives only while it keeps matching."""
+
+    def __init__(self) -> None:
+        self._x = np.zeros((0, 8))
+        self._P = np.zeros((0, 8, 8))
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._next_id = 0
+
+    def step(self, boxes: np.ndarray) -> list[int]:
+        """Advance one frame with (N,4) xyxy detections → track ID per detection."""
+        n = len(boxes)
+        x = self._x @ _F.T
+        P = _F @ self._P @ _F.T + _Q
+
+        rows = cols = np.zeros(0, dtype=np.int64)
+        if n and len(x):
+            cost = 1.0 - iou_matrix(boxes, _z_to_xyxy(x))
+            rows, cols = linear_sum_assignment(cost)
+            ok = cost[rows, cols] < _MAX_MATCH_COST
+            rows, cols = rows[ok], cols[ok]
+
+        z = _xyxy_to_z(boxes)
+        new_x = np.zeros((n, 8))
+        new_x[:, :4] = z
+        new_P = np.repeat(_P0[None], n, axis=0)
+        ids = np.empty(n, dtype=np.int64)
+
+        if len(rows):
+            # Batched Kalman correction for the matched tracks
+            xm, Pm = x[cols], P[cols]
+            S = _H @ Pm @ _H.T + _R
+            K = Pm @ _H.T @ np.linalg.inv(S)
+            innovation = z[rows] - xm @ _H.T
+            new_x[rows] = xm + (K @ innovation[:, :, None])[:, :, 0]
+            new_P[rows] = (np.eye(8) - K @ _H) @ Pm
+            ids[rows] = self._ids[cols]
+
+        unmatched = np.setdiff1d(np.arange(n), rows)
+        ids[unmatched] = np.arange(self._next_id, self._next_id + len(unmatched))
+        self._next_id += len(unmatched)
+
+        self._x, self._P, self._ids = new_x, new_P, ids
+        return ids.tolist()
@@ -2,7 +2,6 @@ import logging
 from datetime import datetime, timezone
 
 import numpy as np
-from ultralytics import YOLO
 
 from config import (
     DETECTION_DEVICE,
@@ -10,7 +9,14 @@ from config import (
     MODEL_DIR,
     WEAPON_CONFIDENCE_THRESHOLD,
 )
-from detectors.base import BaseDetector
+from detectors.base import BaseDetector, bounding_boxes, round_confidences
+from detectors.yolo_loader import (
+    load_yolo,
+    make_predictor,
+    prepare_inputs,
+    takes_channels_last,
+    to_host,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +35,8 @@ class WeaponDetector(BaseDetector):
 
     def __init__(self) -> None:
         self._model = None
+        self._predictor = None
+        self._class_names: tuple[str, ...] = ()
         self._enabled = False
 
         if not ENABLE_WEAPON_DETECTION:
@@ -48,8 +56,14 @@ class WeaponDetector(BaseDetector):
             _WEIGHTS,
             DETECTION_DEVICE,
         )
-        self._model = YOLO(str(_WEIGHTS))
-        self._model.to(DETECTION_DEVICE)
+        self._model = load_yolo(_WEIGHTS)
+        self._predictor = make_predictor(self._model, conf=WEAPON_CONFIDENCE_THRESHOLD)
+        self._channels_last = takes_channels_last(self._predictor)
+        # class id → name, indexed directly per box; gaps in the id range read "weapon"
+        names = self._model.names or {}
+        self._class_names = tuple(
+            names.get(i, "weapon") for i in range(max(names, default=-1) + 1)
+        )
         self._enabled = True
         logger.info(
             "[WeaponDetector] Ready (confidence threshold=%.2f)",
@@ -68,46 +82,52 @@ class WeaponDetector(BaseDetector):
     _SKIP_CAMERAS = {"cam_10", "cam_3"}
 
     def detect(self, frame: np.ndarray, cam_id: str) -> list[dict]:
+        return self.detect_batch([frame], [cam_id])[cam_id]
+
+    def detect_batch(
+        self,
+        frames: list[np.ndarray],
+        cam_ids: list[str],
+        changed: list[bool] | None = None,
+    ) -> dict[str, list[dict]]:
+        events_by_cam: dict[str, list[dict]] = {cam_id: [] for cam_id in cam_ids}
         if not self.enabled or self._model is None:
-            return []
-        if cam_id in self._SKIP_CAMERAS:
-            return []
-
-        h, w = frame.shape[:2]
-        results = self._model(
-            frame,
-            conf=WEAPON_CONFIDENCE_THRESHOLD,
-            verbose=False,
+            return events_by_cam
+        keep = [i for i, cam_id in enumerate(cam_ids) if cam_id not in self._SKIP_CAMERAS]
+        if not keep:
+            return events_by_cam
+
+        # One forward pass for every non-skipped camera in the tick
+        inputs, regions = prepare_inputs(
+            [frames[i] for i in keep], channels_last=self._channels_last
         )
-
-        events: list[dict] = []
-        for result in results:
-            for box in result.boxes:
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                cls_id = int(box.cls[0])
-                cls_name = (result.names or {}).get(cls_id, "weapon")
-                events.append(
-                    {
-                        "camera_id": cam_id,
-                        "event_type": "weapon_detected",
-                        "timestamp": datetime.now(timezone.utc).isoformat(),
-                        "confidence": round(float(box.conf[0]), 3),
-                        "weapon_type": cls_name,
-                        "bounding_box": {
-                            "x": round(x1 / w, 4),
-                            "y": round(y1 / h, 4),
-                            "width": round((x2 - x1) / w, 4),
-                            "height": round((y2 - y1) / h, 4),
-                        },
-                    }
+        results = self._predictor(inputs)
+        now_iso = datetime.now(timezone.utc).isoformat()
+        # (n, 6) x1 y1 x2 y2 conf cls per camera, one device→host copy
+        box_data = to_host([r.boxes.data for r in results])
+        for i, data, region in zip(keep, box_data, regions):
+            cam_id = cam_ids[i]
+            boxes = bounding_boxes(region.normalize_boxes(data[:, :4]))
+            confs = round_confidences(data[:, 4])
+            cls_ids = data[:, 5].astype(int).tolist()
+            events = [
+                {
+                    "camera_id": cam_id,
+                    "event_type": "weapon_detected",
+                    "timestamp": now_iso,
+                    "confidence": conf,
+                    "weapon_type": self._class_names[cls_id],
+                    "bounding_box": box,
+                }
+                for box, conf, cls_id in zip(boxes, confs, cls_ids)
+            ]
+            if events:
+                logger.info(
+                    "[WeaponDetector] %d weapon(s) on %s: %s",
+                    len(events),
+                    cam_id,
+                    [e["weapon_type"] for e in events],
                 )
+            events_by_cam[cam_id] = events
 
-        if events:
-            logger.info(
-                "[WeaponDetector] %d weapon(s) on %s: %s",
-                len(events),
-                cam_id,
-                [e["weapon_type"] for e in events],
-            )
-
-        return events
+        return events_by_cam
@@ -0,0 +1,78 @@
+"""
+worker.py — Runs one detector on its own thread.
+
+The pipeline hands each DetectorWorker the newest batch through a
+one-slot input queue. If the detector is still busy with the previous batch,
+submit() drops that stale batch rather than queuing behind it. A slow
+detector (fight pose) therefore never holds back a fast one (motion): each
+runs at min(capture rate, its own speed).
+
+Results go to a shared output queue as (detector, tick, {cam_id: events}).
+"""
+import logging
+import queue
+import threading
+
+from detectors.base import BaseDetector
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class DetectorWorker:
+    """Daemon thread that feeds batches from in_q through detector.detect_batch().
+
+    Each detector gets exactly one worker, so a predictor that is not thread-safe
+    is only ever called from one thread.
+    """
+
+    def __init__(self, detector: BaseDetector, in_q: queue.Queue, out_q: queue.Queue) -> None:
+        self.detector = detector
+        self._in_q = in_q
+        self._out_q = out_q
+        self._thread = threading.Thread(
+            target=self._run, name=f"worker-{detector.name}", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Ask the thread to exit after its current batch; returns immediately."""
+        self.submit(_STOP)
+
+    def join(self, timeout: float | None = None) -> None:
+        self._thread.join(timeout)
+
+    def submit(self, item) -> None:
+        """Put a (tick, cam_ids, frames, changed) batch, replacing any batch not yet started."""
+        try:
+            self._in_q.put_nowait(item)
+        except queue.Full:
+            try:
+                self._in_q.get_nowait()
+            except queue.Empty:
+                pass
+            self._in_q.put_nowait(item)
+
+    def _run(self) -> None:
+        while True:
+            item = self._in_q.get()
+            if item is _STOP:
+                return
+            tick, cam_ids, frames, changed = item
+            try:
+                events_by_cam = self.detector.detect_batch(frames, cam_ids, changed)
+            except Exception as exc:
+                logger.error(
+                    "[pipeline] %s raised on %s: %s",
+                    self.detector.name, ",".join(cam_ids), exc, exc_info=True,
+                )
+                continue
+            self._out_q.put((self.detector, tick, events_by_cam))
+
+
+def make_worker(detector: BaseDetector, out_q: queue.Queue) -> DetectorWorker:
+    """DetectorWorker with the standard drop-oldest one-slot input queue."""
+    return DetectorWorker(detector, queue.Queue(maxsize=1), out_q)
@@ -0,0 +1,253 @@
+"""
+yolo_loader.py — Shared YOLO model loading for the detectors.
+
+Every YOLO-backed detector loads its weights through load_yolo(), gets a
+warmed persistent predictor from make_predictor() and builds its model input
+with prepare_inputs(), so device-specific tuning lives in one place.
+
+Input layout follows the backend: PyTorch weights on CUDA run channels-last
+and take an NHWC-strided batch, while TensorRT engines are bound to the
+batch's data pointer and read it as dense NCHW (see takes_channels_last()).
+"""
+import logging
+import shutil
+import threading
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from ultralytics import YOLO
+
+from config import CAMERAS, DETECTION_DEVICE, MODEL_DIR
+
+logger = logging.getLogger(__name__)
+
+_CUDA = DETECTION_DEVICE.startswith("cuda")
+
+MODEL_IMGSZ = 640
+_PAD_VALUE = 114 / 255.0  # Ultralytics letterbox grey
+
+if _CUDA:
+    # Input shapes are fixed per camera set, so autotuned conv kernels stay valid
+    torch.backends.cudnn.benchmark = True
+
+
+def int8_engine_path(weights) -> Path:
+    """Where calibrate_int8.py writes the INT8 TensorRT engine for `weights`."""
+    return MODEL_DIR / f"{Path(weights).stem}_int8.engine"
+
+
+def fp16_engine_path(weights) -> Path:
+    """Where load_yolo() caches the FP16 TensorRT engine it exports for `weights`."""
+    return MODEL_DIR / f"{Path(weights).stem}_fp16.engine"
+
+
+def _export_fp16_engine(model: YOLO, weights) -> Path | None:
+    """Export `model` to a cached FP16 TensorRT engine; None if the export fails.
+
+    The engine is dynamic up to one frame per camera, matching the pipeline's
+    batches. Exporting takes minutes, but only happens on the first CUDA start.
+    """
+    dst = fp16_engine_path(weights)
+    logger.info("[yolo] Exporting %s to FP16 TensorRT engine (one-time)...", weights)
+    try:
+        exported = model.export(
+            format="engine",
+            half=True,
+            dynamic=True,
+            batch=len(CAMERAS),
+            imgsz=MODEL_IMGSZ,
+            device=0,
+            workspace=4,
+            verbose=False,
+        )
+    except Exception as exc:
+        logger.warning("[yolo] Engine export failed for %s: %s — using PyTorch weights", weights, exc)
+        return None
+    MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    shutil.move(str(exported), str(dst))
+    return dst
+
+
+def load_yolo(weights) -> YOLO:
+    """Load `weights` for DETECTION_DEVICE.
+
+    On CUDA a TensorRT engine is used: the INT8 engine from calibrate_int8.py
+    if present, else an FP16 engine, exported from `weights` on first start
+    and cached under MODEL_DIR. If the export fails, or on other devices, the
+    PyTorch weights are used (FP16/NHWC is applied by make_predictor()).
+    Engines are tied to the GPU and TensorRT version they were built with —
+    delete the cached file after changing either. check_engines.py verifies
+    that they detect the same boxes as the PyTorch weights.
+    """
+    model = None
+    if _CUDA:
+        engine = int8_engine_path(weights)
+        if engine.exists():
+            logger.info("[yolo] Using INT8 engine %s", engine)
+            return YOLO(str(engine))  # engines are device-bound; no .to()
+
+        engine = fp16_engine_path(weights)
+        if not engine.exists():
+            model = YOLO(str(weights))
+            engine = _export_fp16_engine(model, weights)
+        if engine is not None:
+            logger.info("[yolo] Using FP16 engine %s", engine)
+            return YOLO(str(engine))
+
+    if model is None:
+        model = YOLO(str(weights))
+    model.to(DETECTION_DEVICE)
+    return model
+
+
+def make_predictor(model: YOLO, **predict_kwargs):
+    """Set up and warm `model`'s predictor once, with its arguments fixed.
+
+    Runs one dummy batch through the same input path the detectors use, so
+    predictor construction, model fusing and the first CUDA kernel launches
+    happen at startup. Calling the returned predictor on later batches skips
+    the per-call argument parsing and merging of YOLO.__call__.
+
+    On CUDA the predictor runs FP16, and PyTorch weights are switched to
+    channels-last after Ultralytics has fused them (fusing builds new,
+    NCHW-contiguous conv weights). Pass takes_channels_last(predictor) to
+    prepare_inputs() to build matching batches.
+    """
+    dummy = [np.zeros((MODEL_IMGSZ, MODEL_IMGSZ, 3), dtype=np.uint8)]
+    inputs, _ = prepare_inputs(dummy)
+    model.predict(inputs, imgsz=MODEL_IMGSZ, half=_CUDA, verbose=False, **predict_kwargs)
+    predictor = model.predictor
+    if takes_channels_last(predictor):
+        predictor.model.model.to(memory_format=torch.channels_last)
+        inputs, _ = prepare_inputs(dummy, channels_last=True)
+        predictor(inputs)  # re-tune cuDNN for the NHWC layout
+    return predictor
+
+
+def takes_channels_last(predictor) -> bool:
+    """True if `predictor` runs PyTorch weights on CUDA, which make_predictor() makes channels-last.
+
+    TensorRT engines get the batch's raw data pointer (Ultralytics never calls
+    .contiguous() on it), so they need an NCHW-contiguous batch instead.
+    """
+    return _CUDA and isinstance(predictor.model.model, torch.nn.Module)
+
+
+def to_host(tensors: list[torch.Tensor]) -> list[np.ndarray]:
+    """Copy per-image result tensors (same trailing shape) to NumPy in one transfer.
+
+    Concatenating first means one device→host sync for the whole batch instead
+    of one per image (or per box, when indexing tensors element-wise).
+    """
+    if not tensors:
+        return []
+    host = torch.cat(tensors).cpu().numpy()
+    return np.split(host, np.cumsum([len(t) for t in tensors])[:-1])
+
+
+class InputRegion(NamedTuple):
+    """Where a camera frame sits inside the model input, in input pixels."""
+    left: float
+    top: float
+    width: float
+    height: float
+
+    def normalize_boxes(self, xyxy: np.ndarray) -> np.ndarray:
+        """(N,4) model-space xyxy → frame-normalised 0-1 xyxy, same dtype."""
+        inv_w, inv_h = 1.0 / self.width, 1.0 / self.height
+        offset = np.array([self.left, self.top, self.left, self.top], dtype=xyxy.dtype)
+        inv_scale = np.array([inv_w, inv_h, inv_w, inv_h], dtype=xyxy.dtype)
+        return np.clip((xyxy - offset) * inv_scale, 0.0, 1.0)
+
+    def normalize_points(self, xy: np.ndarray) -> np.ndarray:
+        """(..., 2) model-space x, y → frame-normalised coordinates (unclipped)."""
+        offset = np.array([self.left, self.top], dtype=xy.dtype)
+        inv_scale = np.array([1.0 / self.width, 1.0 / self.height], dtype=xy.dtype)
+        return (xy - offset) * inv_scale
+
+
+# Per-thread pinned host buffers for frame uploads and device input batches:
+# each detector runs on its own worker thread, so a buffer is never refilled
+# by another detector's batch in flight
+_staging = threading.local()
+
+
+def _upload(slot: int, frame: np.ndarray) -> torch.Tensor:
+    """Copy `frame` to the GPU through a pinned staging buffer, asynchronously.
+
+    Pageable memory forces a synchronous, driver-staged copy; from pinned
+    memory the DMA runs non-blocking, overlapping the next frame's CPU copy.
+    """
+    buffers = getattr(_staging, "buffers", None)
+    if buffers is None:
+        buffers = _staging.buffers = {}
+    key = (slot, frame.shape)
+    buf = buffers.get(key)
+    if buf is None:
+        buf = buffers[key] = torch.empty(frame.shape, dtype=torch.uint8, pin_memory=True)
+    np.copyto(buf.numpy(), frame)
+    return buf.to(DETECTION_DEVICE, non_blocking=True)
+
+
+def _input_batch(n: int, channels_last: bool) -> torch.Tensor:
+    """This thread's preallocated FP16 (n,3,640,640) input, reset to padding.
+
+    NHWC-strided for channels-last PyTorch weights, dense NCHW otherwise.
+
+    Reusing it is safe without a sync: the refill is queued on the same CUDA
+    stream as the previous batch's forward pass, so it runs after it.
+    """
+    batches = getattr(_staging, "batches", None)
+    if batches is None:
+        batches = _staging.batches = {}
+    batch = batches.get((n, channels_last))
+    if batch is None:
+        batch = torch.empty(
+            (n, 3, MODEL_IMGSZ, MODEL_IMGSZ), dtype=torch.float16, device=DETECTION_DEVICE
+        )
+        if channels_last:
+            batch = batch.contiguous(memory_format=torch.channels_last)
+        batches[(n, channels_last)] = batch
+    return batch.fill_(_PAD_VALUE)
+
+
+def prepare_inputs(frames: list[np.ndarray], channels_last: bool = False):
+    """Build the model input for a batch of BGR frames.
+
+    On CUDA, frames are uploaded as uint8 via pinned memory and letterboxed / colour-converted /
+    normalised on the GPU into one FP16 (B,3,640,640) tensor, so no cv2
+    resizing runs on the CPU. The tensor is channels-last when `channels_last`
+    (PyTorch weights, see takes_channels_last()), NCHW-contiguous otherwise
+    (TensorRT engines). Elsewhere the frames go to Ultralytics unchanged.
+
+    Returns (inputs, regions): pass `inputs` to the model and map each
+    result's boxes back to its frame with `regions[i].normalize_boxes()`.
+    """
+    if not _CUDA:
+        return frames, [InputRegion(0.0, 0.0, f.shape[1], f.shape[0]) for f in frames]
+
+    # The previous batch's uploads read these staging buffers; wait for them
+    done = getattr(_staging, "done", None)
+    if done is not None:
+        done.synchronize()
+
+    size = MODEL_IMGSZ
+    batch = _input_batch(len(frames), channels_last)
+    regions = []
+    for i, frame in enumerate(frames):
+        h, w = frame.shape[:2]
+        scale = min(size / h, size / w)
+        nh, nw = round(h * scale), round(w * scale)
+        top, left = (size - nh) // 2, (size - nw) // 2
+        img = _upload(i, frame)
+        img = img.permute(2, 0, 1).flip(0).unsqueeze(0).half().div_(255.0)  # BGR HWC → RGB CHW
+        batch[i, :, top:top + nh, left:left + nw] = F.interpolate(
+            img, size=(nh, nw), mode="bilinear", align_corners=False
+        )[0]
+        regions.append(InputRegion(float(left), float(top), float(nw), float(nh)))
+    _staging.done = torch.cuda.Event()
+    _staging.done.record()
+    return batch, regions
@@ -19,7 +19,7 @@ from fastapi.responses import JSONResponse, StreamingResponse
 
 import camera_manager
 import detector_pipeline
-from config import ALLOWED_ORIGINS, CAMERAS
+from config import ALLOWED_ORIGINS
 from models import CameraStatus
 from streamer import mjpeg_stream
 from websocket_manager import manager
@@ -48,13 +48,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-VALID_CAM_IDS = {c["id"] for c in CAMERAS}
-
 
 def _require_cam(cam_id: str):
-    if cam_id not in VALID_CAM_IDS:
+    # Captures exist for exactly the configured cameras: one lookup validates and fetches
+    cap = camera_manager.get_capture(cam_id)
+    if cap is None:
         raise HTTPException(status_code=404, detail=f"Camera '{cam_id}' not found")
-    return camera_manager.get_capture(cam_id)
+    return cap
 
 
 @app.get("/.well-known/appspecific/com.chrome.devtools.json", include_in_schema=False)
@@ -64,7 +64,11 @@ async def chrome_devtools():
 
 @app.get("/cameras", response_model=List[CameraStatus])
 async def list_cameras():
-    return camera_manager.get_all_statuses()
+    # Pre-serialized: skips FastAPI's per-request validation and JSON encoding
+    return fastapi.responses.Response(
+        content=camera_manager.get_all_statuses_json(),
+        media_type="application/json",
+    )
 
 
 @app.get("/stream/{cam_id}")
@@ -79,8 +83,8 @@ async def stream_camera(cam_id: str):
 @app.get("/snapshot/{cam_id}")
 async def snapshot_camera(cam_id: str):
     cap = _require_cam(cam_id)
-    loop = asyncio.get_event_loop()
-    frame_bytes = await loop.run_in_executor(None, cap.read_frame)
+    loop = asyncio.get_running_loop()
+    frame_bytes = await loop.run_in_executor(camera_manager.CAMERA_EXECUTOR, cap.read_frame)
     if frame_bytes is None:
         from streamer import OFFLINE_FRAME
         frame_bytes = OFFLINE_FRAME
@@ -2,6 +2,8 @@ import asyncio
 import random
 from datetime import datetime, timezone
 
+import numpy as np
+
 from config import (
     CAMERAS,
     CONFIDENCE_MAX,
@@ -12,17 +14,20 @@ from config import (
 )
 from websocket_manager import manager
 
+_RNG = np.random.default_rng()
+# Per-field uniform ranges: x, y, width, height, confidence
+_LOW = np.array([0.05, 0.05, 0.10, 0.10, CONFIDENCE_MIN])
+_HIGH = np.array([0.70, 0.70, 0.25, 0.25, CONFIDENCE_MAX])
+
 
 def _make_event(cam_id: str) -> dict:
-    x = round(random.uniform(0.05, 0.70), 3)
-    y = round(random.uniform(0.05, 0.70), 3)
-    w = round(random.uniform(0.10, 0.25), 3)
-    h = round(random.uniform(0.10, 0.25), 3)
+    # One vectorised draw + round for all five numeric fields
+    x, y, w, h, conf = np.round(_RNG.uniform(_LOW, _HIGH), 3).tolist()
     return {
         "camera_id": cam_id,
         "event_type": random.choice(DETECTION_TYPES),
         "timestamp": datetime.now(timezone.utc).isoformat(),
-        "confidence": round(random.uniform(CONFIDENCE_MIN, CONFIDENCE_MAX), 3),
+        "confidence": conf,
         "bounding_box": {"x": x, "y": y, "width": w, "height": h},
     }
 
@@ -1,10 +1,10 @@
 import asyncio
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 
 import cv2
 import numpy as np
 
-from camera_manager import CameraCapture
+from camera_manager import CAMERA_EXECUTOR, CameraCapture
 from config import MJPEG_FPS_TARGET
 
 FRAME_INTERVAL = 1.0 / MJPEG_FPS_TARGET
@@ -15,26 +15,73 @@ _, _black_buf = cv2.imencode(".jpg", _black)
 OFFLINE_FRAME = bytes(_black_buf)
 
 
+_PART_HEADER = b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: "
+
+
 def _build_mjpeg_part(jpeg_bytes: bytes) -> bytes:
-    header = (
-        b"--frame\r\n"
-        b"Content-Type: image/jpeg\r\n"
-        b"Content-Length: " + str(len(jpeg_bytes)).encode() + b"\r\n"
-        b"\r\n"
+    # One join sized up front: the JPEG payload is copied once, not per "+"
+    return b"".join(
+        (_PART_HEADER, str(len(jpeg_bytes)).encode(), b"\r\n\r\n", jpeg_bytes, b"\r\n")
     )
-    return header + jpeg_bytes + b"\r\n"
 
 
-async def mjpeg_stream(cap: CameraCapture) -> AsyncGenerator[bytes, None]:
-    loop = asyncio.get_event_loop()
-    while True:
-        start = loop.time()
+class _JpegFeed:
+    """One camera's MJPEG parts, produced once and shared by all its viewers.
+
+    A single producer task pulls JPEGs at MJPEG_FPS_TARGET while at least one
+    viewer is connected; each viewer just waits for the next part, so N
+    browsers on one camera cost one executor hop and one header build per
+    frame instead of N.
+    """
+
+    def __init__(self, cap: CameraCapture) -> None:
+        self._cap = cap
+        self._ready = asyncio.Condition()
+        self._part = _build_mjpeg_part(OFFLINE_FRAME)
+        self._seq = 0
+        self._viewers = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _produce(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+
+            frame_bytes = await loop.run_in_executor(CAMERA_EXECUTOR, self._cap.read_frame)
+            if frame_bytes is None:
+                frame_bytes = OFFLINE_FRAME
+
+            async with self._ready:
+                self._part = _build_mjpeg_part(frame_bytes)
+                self._seq += 1
+                self._ready.notify_all()
+
+            elapsed = loop.time() - start
+            await asyncio.sleep(max(0.0, FRAME_INTERVAL - elapsed))
+
+    async def subscribe(self) -> AsyncGenerator[bytes, None]:
+        self._viewers += 1
+        if self._task is None:
+            self._task = asyncio.create_task(self._produce())
+        seen = self._seq
+        try:
+            while True:
+                async with self._ready:
+                    await self._ready.wait_for(lambda: self._seq != seen)
+                    seen, part = self._seq, self._part
+                yield part
+        finally:
+            self._viewers -= 1
+            if self._viewers == 0 and self._task is not None:
+                self._task.cancel()
+                self._task = None
+
 
-        frame_bytes = await loop.run_in_executor(None, cap.read_frame)
-        if frame_bytes is None:
-            frame_bytes = OFFLINE_FRAME
+_feeds: dict[CameraCapture, _JpegFeed] = {}
 
-        yield _build_mjpeg_part(frame_bytes)
 
-        elapsed = loop.time() - start
-        await asyncio.sleep(max(0.0, FRAME_INTERVAL - elapsed))
+def mjpeg_stream(cap: CameraCapture) -> AsyncGenerator[bytes, None]:
+    feed = _feeds.get(cap)
+    if feed is None:
+        feed = _feeds[cap] = _JpegFeed(cap)
+    return feed.subscribe()
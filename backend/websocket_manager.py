@@ -1,36 +1,78 @@
 import asyncio
+import contextlib
 import json
 from fastapi import WebSocket
-from typing import Set
+from typing import Callable, Set, Tuple
+
+
+def _load_encoder() -> Callable[[dict], str]:
+    """orjson (pip install orjson) when available, else the stdlib json module.
+
+    The browser parses text frames, so orjson's bytes are decoded back to str.
+    """
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps
+    return lambda payload: orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+_encode = _load_encoder()
+
+# A client whose socket can't take a message within this is dropped, so one
+# stalled browser never holds up delivery to the rest
+_SEND_TIMEOUT_SECS = 5.0
 
 
 class ConnectionManager:
+    """Connected event clients, kept as a copy-on-write tuple.
+
+    Everything runs on the event loop and no update awaits midway, so
+    connect/disconnect swap in a new tuple and broadcast() iterates whichever
+    tuple it read — no lock, and no snapshot copy per broadcast.
+    """
+
     def __init__(self):
-        self._connections: Set[WebSocket] = set()
-        self._lock = asyncio.Lock()
+        self._connections: Tuple[WebSocket, ...] = ()
+        self._closing: Set[asyncio.Task] = set()  # strong refs until each close finishes
 
     async def connect(self, ws: WebSocket) -> None:
         await ws.accept()
-        async with self._lock:
-            self._connections.add(ws)
+        self._connections = (*self._connections, ws)
 
     async def disconnect(self, ws: WebSocket) -> None:
-        async with self._lock:
-            self._connections.discard(ws)
+        self._connections = tuple(c for c in self._connections if c is not ws)
+
+    @staticmethod
+    async def _close(ws: WebSocket) -> None:
+        """Close a dropped client so its browser sees the disconnect and reconnects.
+
+        The socket may already be gone or still stalled, so errors and a
+        second timeout are swallowed.
+        """
+        with contextlib.suppress(Exception):
+            await asyncio.wait_for(ws.close(), _SEND_TIMEOUT_SECS)
 
     async def broadcast(self, payload: dict) -> None:
-        message = json.dumps(payload)
-        dead: Set[WebSocket] = set()
-        async with self._lock:
-            targets = set(self._connections)
-        for ws in targets:
-            try:
-                await ws.send_text(message)
-            except Exception:
-                dead.add(ws)
+        message = _encode(payload)
+        targets = self._connections
+        if not targets:
+            return
+        # Send to every client concurrently: a broadcast takes as long as the
+        # slowest client, not the sum of all of them
+        results = await asyncio.gather(
+            *(asyncio.wait_for(ws.send_text(message), _SEND_TIMEOUT_SECS) for ws in targets),
+            return_exceptions=True,
+        )
+        dead = {ws for ws, result in zip(targets, results) if isinstance(result, Exception)}
         if dead:
-            async with self._lock:
-                self._connections -= dead
+            self._connections = tuple(c for c in self._connections if c not in dead)
+            # Closed in the background: a stalled socket's close can take the
+            # full timeout again, and the next broadcast shouldn't wait for it
+            for ws in dead:
+                task = asyncio.create_task(self._close(ws))
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
 
 
 manager = ConnectionManager()